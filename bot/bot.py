@@ -7,8 +7,26 @@
 
 from aiogram import Dispatcher, Bot
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
 
+from bot.storage import SQLiteStorage
 from config import settings
 
-dp = Dispatcher()
-bot = Bot(settings.BOT, default=DefaultBotProperties(parse_mode='HTML'))
\ No newline at end of file
+if settings.FSM_STORAGE == "sqlite":
+    storage = SQLiteStorage(
+        settings.DATA_DIR / "fsm.sqlite3",
+        ttl=settings.FSM_TTL_HOURS * 3600,
+        sweep_interval=settings.FSM_SWEEP_SECONDS,
+    )
+else:
+    storage = MemoryStorage()
+
+dp = Dispatcher(storage=storage)
+# свой адрес Bot API — локальный сервер или фейковый API нагрузочного теста
+session = None
+if settings.TELEGRAM_API_URL:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+
+bot = Bot(settings.BOT, session=session, default=DefaultBotProperties(parse_mode='HTML'))
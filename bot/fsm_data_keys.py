@@ -8,10 +8,10 @@ from typing import TypedDict
 
 class CardFSMData(TypedDict):
     prev: int
-    image: int
+    image_id: str
     occasion: str
     text_role: str
     text_index: int
-    texts:list[str]
+    text_category: str
     user_text: str
     prompt_message_id: int
\ No newline at end of file
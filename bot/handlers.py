@@ -10,22 +10,27 @@
 Бизнес-логика и генерация изображений вынесены в services.
 """
 
-import asyncio
 from aiogram import Router, F
 from aiogram.filters import CommandStart, StateFilter
-from aiogram.types import Message, CallbackQuery, FSInputFile, InputMediaPhoto
+from aiogram.types import Message, CallbackQuery, FSInputFile, BufferedInputFile, InputMediaPhoto
 from bot.fsm import StateImage
-from config import image_files, OCCASIONS
+from config import image_files, OCCASIONS, BackgroundImage, background_positions, find_background, settings
 from bot.keyboards import (select_image_first, select_image, select_resp_for_text, select_occasion,
-                           continue_select_image, start_selector, select_text_first, select_text)
-from services.image_service import get_user_images
+                           continue_select_image, start_selector, select_text_first, select_text,
+                           select_style)
 from aiogram.fsm.context import FSMContext
-from services.image_generator_v3 import pic_creator
-from services.file_storage import clear_user_dir
-from services.text_service import load_texts
+from services.render_engine import RenderQueueFull, render_engine
+from services.card_session import CardSession, start_session, find_session, get_session, drop_session
+from services.image_generator_v3 import RenderedCard
+from services.file_id_cache import is_invalid_file_id, preview_file_ids
+from services.card_cache import card_cache
+from services.storage_manager import output_storage
+from services.text_service import text_catalogue
 from bot.fsm_data_keys import CardFSMData
 from tools.edit_media_with_click_guard import edit_media_prevent_duplicate
 from aiogram.exceptions import TelegramBadRequest
+from pathlib import Path
+import asyncio
 import logging
 
 
@@ -33,6 +38,246 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+BUSY_TEXT = "Сейчас очень много открыток в работе 🙂\nПопробуйте ещё раз через минуту."
+DUPLICATE_TEXT = "Открытка уже создаётся 🙂"
+# больше 10 фото в одном sendMediaGroup Telegram не принимает
+ALBUM_SIZE = 10
+
+
+def status_text(text: str) -> str:
+    """
+    Текст статуса генерации с местом в очереди, если все процессы заняты.
+    """
+    if render_engine.pending >= render_engine.workers:
+        return f"{text}\nВаше место в очереди: {render_engine.queue_length + 1}"
+    return text
+
+
+def card_input_file(card: RenderedCard):
+    """
+    Готовит открытку к отправке: file_id уже загруженной открытки,
+    байты из памяти — BufferedInputFile, файл на диске — FSInputFile.
+    """
+    if card.file_id:
+        return card.file_id
+    if card.data is not None:
+        return BufferedInputFile(card.data, filename=card.filename)
+    return FSInputFile(card.path)
+
+
+async def remember_card(
+    card: RenderedCard, message, session: CardSession | None = None, index: int = 0
+) -> None:
+    """
+    Запоминает file_id открытки после её первой отправки:
+    в сессии пользователя и, для открыток из кэша, в card_cache.
+    """
+    if card.file_id or not isinstance(message, Message) or not message.photo:
+        return
+    file_id = message.photo[-1].file_id
+    if session is not None:
+        session.remember_file_id(index, file_id)
+    if card.cache_key:
+        await asyncio.to_thread(card_cache.set_file_id, card.cache_key, file_id)
+
+
+def progress_label(session: CardSession | None) -> str | None:
+    """
+    Счётчик готовых открыток для кнопки «Следующая», пока генерация идёт.
+    """
+    if session is None or session.finished:
+        return None
+    return f"{session.ready_count}/{len(session)} готово"
+
+
+def preview_keyboard(session: CardSession):
+    # до первого перелистывания показана первая открытка без кнопки «Назад»
+    if session.position is None:
+        return select_image_first(progress_label(session))
+    return select_image(progress_label(session))
+
+
+async def show_progress(message, session: CardSession) -> None:
+    """
+    Обновляет счётчик «3/7 готово» на кнопках предпросмотра
+    по мере готовности открыток. Отменяется вместе с сессией.
+    """
+    if not isinstance(message, Message):
+        return
+    label = progress_label(session)
+    async for _ in session.stream():
+        if progress_label(session) == label:
+            continue
+        label = progress_label(session)
+        try:
+            await message.bot.edit_message_reply_markup(
+                chat_id=message.chat.id,
+                message_id=message.message_id,
+                reply_markup=preview_keyboard(session),
+            )
+        except TelegramBadRequest:
+            # сообщение удалено или уже с той же клавиатурой
+            continue
+
+
+async def discard_status(status_msg: Message) -> None:
+    """
+    Удаляет сообщение «Минуточку...» запроса, который уже не покажет открытку.
+    """
+    try:
+        await status_msg.delete()
+    except TelegramBadRequest:
+        # уже удалено
+        pass
+
+
+async def send_album(status_msg: Message, session: CardSession) -> None:
+    """
+    Режим CARD_DELIVERY=album: дожидается всех стилей и отправляет их
+    альбомами (sendMediaGroup, от 2 до ALBUM_SIZE открыток в одном),
+    затем клавиатуру выбора открытки по номеру в альбоме.
+
+    Все открытки загружаются одним запросом вместо edit_media на каждый стиль;
+    file_id из ответа запоминаются — выбранная открытка уходит без новой загрузки.
+
+    Запускается задачей сессии (session.attach): не держит хендлер
+    и место в UPDATE_CONCURRENCY, отменяется вместе с сессией.
+    """
+    try:
+        await _send_album(status_msg, session)
+    except Exception:
+        logger.exception("Ошибка отправки альбома | пользователь=%s", session.user_id)
+        await status_msg.answer("Ошибка при создании открытки 😔")
+
+
+async def _send_album(status_msg: Message, session: CardSession) -> None:
+    label = progress_label(session)
+    async for _ in session.stream():
+        if progress_label(session) in (label, None):
+            continue
+        label = progress_label(session)
+        try:
+            await status_msg.edit_text(f"Минуточку, идет процесс создания открыток: {label}")
+        except TelegramBadRequest:
+            continue
+    if get_session(session.user_id) is not session:
+        # пользователь начал заново, пока открытки генерировались
+        return
+
+    ready = [(index, card) for index, card in enumerate(session.cards) if card is not None]
+    if not ready:
+        raise RuntimeError("Ни один стиль не сгенерирован")
+    for start in range(0, len(ready), ALBUM_SIZE):
+        chunk = ready[start:start + ALBUM_SIZE]
+        if len(chunk) == 1:
+            # в альбоме не меньше двух фото: одиночная открытка — обычным сообщением
+            (_, card), = chunk
+            sent = [await status_msg.answer_photo(card_input_file(card), caption=str(start + 1))]
+        else:
+            sent = await status_msg.answer_media_group([
+                InputMediaPhoto(media=card_input_file(card), caption=str(start + position))
+                for position, (_, card) in enumerate(chunk, start=1)
+            ])
+        for (index, card), message in zip(chunk, sent):
+            await remember_card(card, message, session, index)
+
+    try:
+        await status_msg.delete()
+    except TelegramBadRequest:
+        # сообщение уже удалено
+        pass
+    await status_msg.answer(
+        "Выберите открытку по номеру",
+        reply_markup=select_style([index for index, _ in ready])
+    )
+
+
+async def send_chosen_card(call: CallbackQuery, state: FSMContext, index: int) -> None:
+    """
+    Отправляет выбранную открытку отдельным сообщением и завершает сценарий.
+    """
+    data: CardFSMData = await state.get_data()
+    session = get_session(call.from_user.id) or restore_session(call.from_user.id, data)
+    await call.message.delete()
+    card = None
+    if session:
+        try:
+            card = await session.get(index % len(session))
+        except Exception:
+            logger.exception("Ошибка при создании открытки | пользователь=%s", call.from_user.id)
+    drop_session(call.from_user.id)
+    if card:
+        photo = card_input_file(card)
+        sent = await call.message.answer_photo(photo=photo, reply_markup=start_selector())
+        await remember_card(card, sent)
+        await call.answer()
+    else:
+        await call.message.answer('Что-то пошло не так. Попробуйте еще раз.', reply_markup=start_selector())
+    await state.clear()
+
+
+def restore_session(user_id: int, data: CardFSMData) -> CardSession | None:
+    """
+    Восстанавливает сессию предпросмотра по данным FSM
+    (сессии живут в памяти и теряются при перезапуске бота,
+    а состояние FSM сохраняется). Открытки генерируются заново по запросу,
+    открытки с готовыми текстами берутся из кэша.
+    """
+    if not data.get("occasion"):
+        return None
+    if data.get("text_role") == "bot" and data.get("text_category"):
+        message_text = text_catalogue.text(data["text_category"], data.get("text_index", 0))
+        cacheable = True
+    elif data.get("user_text"):
+        message_text = data["user_text"]
+        cacheable = False
+    else:
+        return None
+    return start_session(
+        user_id, find_background(data.get("image_id")).full, data["occasion"], message_text, cacheable
+    )
+
+
+def background_file(background: BackgroundImage, tier: str = "browse") -> tuple[Path, str | None]:
+    """
+    Путь к варианту фона (browse — для листания, full — полный размер)
+    и его sha256 из каталога (None, если каталога нет).
+    """
+    if tier == "browse":
+        return background.browse, background.browse_sha256 or None
+    return background.full, background.sha256 or None
+
+
+async def send_preview(background: BackgroundImage, tier: str, send):
+    """
+    Отправляет фон: send(photo) получает file_id из кэша,
+    если файл уже загружался в Telegram, иначе сам файл.
+
+    file_id, который Telegram не принял (загружен другим ботом,
+    например из каталога фонов, или устарел), удаляется из кэша,
+    и фон отправляется файлом.
+    """
+    path, content_hash = background_file(background, tier)
+    file_id = preview_file_ids.get(path, content_hash)
+    if file_id:
+        try:
+            return await send(file_id)
+        except TelegramBadRequest as e:
+            if not is_invalid_file_id(e):
+                raise
+            logger.warning("file_id фона не принят, отправляем файл | фон=%s | %s", path.name, e.message)
+            preview_file_ids.forget(path)
+    return await send(FSInputFile(path))
+
+
+def remember_preview(background: BackgroundImage, message, tier: str = "browse") -> None:
+    """
+    Запоминает file_id фона из ответа Telegram.
+    """
+    if isinstance(message, Message) and message.photo:
+        path, content_hash = background_file(background, tier)
+        preview_file_ids.put(path, message.photo[-1].file_id, content_hash)
+
 
 @router.message(CommandStart())
 async def start_pic(message: Message, state: FSMContext):
@@ -44,13 +289,16 @@ async def start_pic(message: Message, state: FSMContext):
 
     await state.clear()
     user_id = message.from_user.id
-    clear_user_dir(user_id)
-    index_image = 0
-    photo = FSInputFile(image_files[index_image])
-
-    await message.answer_photo(photo=photo, caption='Выберите фон для открытки', reply_markup=select_image_first())
+    drop_session(user_id)
+    await output_storage.clear_user_dir(user_id)
+    background = image_files[0]
+
+    sent = await send_preview(background, "browse", lambda photo: message.answer_photo(
+        photo=photo, caption='Выберите фон для открытки', reply_markup=select_image_first()
+    ))
+    remember_preview(background, sent)
     await state.set_state(StateImage.index_image)
-    await state.update_data(image=0)
+    await state.update_data(image_id=background.id)
 
 
 @router.callback_query(F.data.in_({'next', 'back'}), StateFilter(StateImage.index_preview, StateImage.index_image))
@@ -68,31 +316,62 @@ async def navigate_image(call: CallbackQuery, state: FSMContext):
     data: CardFSMData = await state.get_data()
     current_state = await state.get_state()
     files = []
+    session = None
     if current_state == StateImage.index_image:
         files = image_files
-        index_key = "image"
+        index_key = None
     elif current_state == StateImage.index_preview:
-        files = get_user_images(call.from_user.id)
         index_key = "prev"
-        if not files:
+        session = get_session(call.from_user.id) or restore_session(call.from_user.id, data)
+        if not session:
             await call.answer("Нет изображений")
             return
+        files = session.styles
     else:
         await call.answer()
-    ind_image = data.get(index_key, 0)
+        return
+    if index_key is None:
+        # в FSM хранится стабильный id фона, позиция в каталоге вычисляется
+        ind_image = background_positions.get(data.get("image_id"), 0)
+    else:
+        ind_image = data.get(index_key, 0)
 
     delta = 1 if call.data == "next" else -1
     ind_image = (ind_image + delta) % len(files)
 
-    media = InputMediaPhoto(media=FSInputFile(files[ind_image]))
-    ok = await edit_media_prevent_duplicate(
-        call,
-        media,
-        select_image()
-    )
+    if session:
+        # открытка может ещё генерироваться — дожидаемся её
+        try:
+            image = await session.get(ind_image)
+        except RenderQueueFull:
+            await call.answer(BUSY_TEXT, show_alert=True)
+            return
+        except Exception:
+            logger.exception("Ошибка при создании открытки | пользователь=%s", call.from_user.id)
+            await call.answer("Ошибка при создании открытки 😔", show_alert=True)
+            return
+        session.position = ind_image
+        ok = await edit_media_prevent_duplicate(
+            call,
+            InputMediaPhoto(media=card_input_file(image)),
+            select_image(progress_label(session))
+        )
+    else:
+        # для листания — лёгкий browse-вариант фона
+        image = files[ind_image]
+        ok = await send_preview(image, "browse", lambda photo: edit_media_prevent_duplicate(
+            call,
+            InputMediaPhoto(media=photo),
+            select_image()
+        ))
     if not ok:
         return
-    await state.update_data(**{index_key: ind_image})
+    if current_state == StateImage.index_image:
+        remember_preview(image, ok)
+        await state.update_data(image_id=image.id)
+    else:
+        await remember_card(image, ok, session, ind_image)
+        await state.update_data(**{index_key: ind_image})
 
 
 @router.callback_query(F.data=='select', StateFilter(StateImage.index_image, StateImage.index_preview))
@@ -101,44 +380,40 @@ async def select_pic(call: CallbackQuery, state: FSMContext):
     current_state = await state.get_state()
 
     if current_state == StateImage.index_image:
-        await state.update_data(image=data.get("image", 0))
+        await state.update_data(image_id=find_background(data.get("image_id")).id)
         await call.message.delete()
         await call.message.answer('Выбрать текст для открытки', reply_markup=select_resp_for_text())
         await state.set_state(StateImage.occasion)
         await call.answer()
 
     elif current_state == StateImage.index_preview:
-        files = get_user_images(call.from_user.id)
-        ind_key = data.get("prev")
-        await call.message.delete()
-        if files:
-            photo = FSInputFile(files[ind_key])
-            await call.message.answer_photo(photo=photo, reply_markup=start_selector())
-            await call.answer()
-        else:
-            await call.message.answer('Что-то пошло не так. Попробуйте еще раз.', reply_markup=start_selector())
-        await state.clear()
+        await send_chosen_card(call, state, data.get("prev", 0))
     else:
         await call.answer()
 
 
+@router.callback_query(F.data.startswith('style_'), StateFilter(StateImage.index_preview))
+async def select_album_card(call: CallbackQuery, state: FSMContext):
+    """
+    Выбор открытки кнопкой с номером под альбомом (CARD_DELIVERY=album).
+    """
+    await send_chosen_card(call, state, int(call.data.removeprefix('style_')))
+
+
 @router.callback_query(F.data=='not_select_text', StateFilter(StateImage.occasion))
 async def pic_without_text(call: CallbackQuery, state: FSMContext):
     """Отправляет открытку фон без текста"""
     data: CardFSMData = await state.get_data()
-    index = data.get("image", 0)
-    image = image_files[index]
-
-    media = InputMediaPhoto(
-        media=FSInputFile(image),
-        caption='Открытка без добавления текста'
-    )
+    image = find_background(data.get("image_id"))
 
     try:
-        await call.message.edit_media(media=media)
+        edited = await send_preview(image, "full", lambda photo: call.message.edit_media(
+            media=InputMediaPhoto(media=photo, caption='Открытка без добавления текста')
+        ))
     except TelegramBadRequest:
         await call.answer("Пожалуйста, подождите 🙂", show_alert=True)
         return
+    remember_preview(image, edited, "full")
     await call.answer()
     await call.message.answer('Хотите продолжить?', reply_markup=continue_select_image())
     await state.clear()
@@ -147,14 +422,17 @@ async def pic_without_text(call: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == 'continue')
 async def continue_select_pic(call: CallbackQuery, state: FSMContext):
     user_id = call.from_user.id
-    clear_user_dir(user_id)
-    index_image = 0
-    photo = FSInputFile(image_files[index_image])
-
-    await call.message.answer_photo(photo=photo, caption='Выберите фон для открытки', reply_markup=select_image_first())
+    drop_session(user_id)
+    await output_storage.clear_user_dir(user_id)
+    background = image_files[0]
+
+    sent = await send_preview(background, "browse", lambda photo: call.message.answer_photo(
+        photo=photo, caption='Выберите фон для открытки', reply_markup=select_image_first()
+    ))
+    remember_preview(background, sent)
     await call.answer()
     await state.set_state(StateImage.index_image)
-    await state.update_data(image=0)
+    await state.update_data(image_id=background.id)
 
 
 
@@ -193,13 +471,14 @@ async def select_occasion_coming(call: CallbackQuery, state: FSMContext):
         )
         await state.update_data(prompt_message_id=msg.message_id)
     elif role == 'bot':
-        texts = load_texts(occasion_key)
+        # в FSM только категория и номер текста, сами тексты — в text_catalogue
+        category = OCCASIONS[occasion_key]["file"]
         await state.update_data(
-            texts=texts,
+            text_category=category,
             text_index=0
         )
         await call.message.edit_text(
-            texts[0],
+            text_catalogue.text(category, 0),
             reply_markup=select_text_first()
         )
     await state.set_state(StateImage.text)
@@ -236,7 +515,8 @@ async def create_pic_user_text(message: Message, state: FSMContext):
         Этапы:
         - принимает текст
         - удаляет служебное сообщение бота
-        - запускает генерацию изображения в отдельном потоке
+        - генерирует первый стиль и показывает его,
+          остальные стили генерируются в фоне
         - переводит пользователя в режим предпросмотра
 
         Используется только в режиме user_text.
@@ -245,53 +525,76 @@ async def create_pic_user_text(message: Message, state: FSMContext):
 
     text_for_pic = message.text
     user_id = message.from_user.id
+    fon = find_background(data.get("image_id")).full
+    if find_session(user_id, fon, data["occasion"], text_for_pic):
+        # тот же текст ещё раз — открытка уже в работе
+        await message.answer(DUPLICATE_TEXT)
+        return
+    # сессия регистрируется до первого await: повторное сообщение,
+    # пришедшее пока этот хендлер ждёт Telegram, увидит её в find_session
+    session = start_session(user_id, fon, data["occasion"], text_for_pic)
     logger.info(
         "Начата генерация открытки | пользователь=%s | изображение=%s | повод=%s",
         user_id,
-        data["image"],
+        data.get("image_id"),
         data["occasion"]
     )
     await state.update_data(user_text=text_for_pic)
 
     prompt_id = data.get("prompt_message_id")
     if prompt_id:                 # удаляю предыдущее сообщение бота, после принятия сообщения от пользователя.
-        await message.bot.delete_message(
-            chat_id=message.chat.id,
-            message_id=prompt_id
-        )
-    status_msg = await message.answer("Текст принят 👍\nМинуточку, идет процесс создания открытки")
+        try:
+            await message.bot.delete_message(
+                chat_id=message.chat.id,
+                message_id=prompt_id
+            )
+        except TelegramBadRequest:
+            # уже удалено — например, при повторной отправке текста
+            pass
+    status_msg = await message.answer(status_text("Текст принят 👍\nМинуточку, идет процесс создания открытки"))
     try:
-        await asyncio.to_thread(
-            pic_creator,
-            image_files[data["image"]],
-            data["occasion"],
-            text_for_pic,
-            user_id
-        )
+        # первый стиль показываем сразу, остальные дорисуются в фоне
+        first_card = await session.get(0)
+        session.start_background()
         logger.info(
             "Открытка успешно создана | пользователь=%s | режим=текст_пользователя",
             user_id
         )
+    except asyncio.CancelledError:
+        # сессию заменил более новый запрос пользователя — у него свой статус
+        await discard_status(status_msg)
+        raise
+    except RenderQueueFull:
+        logger.warning(
+            "Очередь генерации заполнена | пользователь=%s",
+            user_id
+        )
+        drop_session(user_id)
+        await message.answer(BUSY_TEXT)
+        return
     except Exception:
         logger.exception(
             "Ошибка при создании открытки | пользователь=%s",
             user_id
         )
+        drop_session(user_id)
         await message.answer("Ошибка при создании открытки 😔")
         return
 
-    list_image = get_user_images(user_id)
-    if not list_image:
-        await message.answer("Нет изображений")
-        return
     await state.set_state(StateImage.index_preview)
     await state.update_data(prev=0)
+    if settings.CARD_DELIVERY == "album":
+        session.attach(asyncio.create_task(send_album(status_msg, session)))
+        return
     media = InputMediaPhoto(
-    media=FSInputFile(list_image[0]))
+    media=card_input_file(first_card))
     try:
-        await status_msg.edit_media(media=media, reply_markup=select_image_first())
+        edited = await status_msg.edit_media(media=media, reply_markup=preview_keyboard(session))
     except TelegramBadRequest:
         return
+    await remember_card(first_card, edited, session, 0)
+    # остальные стили дорисовываются — счётчик на кнопке обновляется по мере готовности
+    session.attach(asyncio.create_task(show_progress(edited, session)))
 
 
 
@@ -304,7 +607,8 @@ async def selector_text_next(call: CallbackQuery,state: FSMContext):
     к выбору повода и переводит FSM в состояние StateImage.occasion.
     """
     data: CardFSMData = await state.get_data()
-    texts = data.get('texts')  # список текстов
+    category = data.get('text_category')
+    texts = text_catalogue.get(category) if category else None  # список текстов
     index = data.get('text_index', 0)
     if texts:
         delta = 1 if call.data == "next_text" else -1
@@ -337,47 +641,71 @@ async def create_pic_with_bot_text(call: CallbackQuery, state: FSMContext):
     """
     Создаёт открытку с выбранным готовым текстом.
 
-    Использует текст из списка, сохранённого в FSM,
+    Берёт текст из text_catalogue по категории и номеру из FSM,
     запускает генерацию изображения и переводит пользователя
     в режим предпросмотра результата.
     """
     data: CardFSMData = await state.get_data()
     user_id = call.from_user.id
-    text_list = data['texts']
-    ind = data['text_index']
+    message_text = text_catalogue.text(data['text_category'], data['text_index'])
+    fon = find_background(data.get("image_id")).full
+    if find_session(user_id, fon, data["occasion"], message_text):
+        # повторное нажатие — открытка уже в работе, сообщение не трогаем
+        await call.answer(DUPLICATE_TEXT)
+        return
+    # сессия регистрируется до первого await: второе нажатие,
+    # пришедшее пока этот хендлер ждёт Telegram, увидит её в find_session.
+    # готовый текст + заголовок повода одинаковы для всех — открытки берутся из кэша
+    session = start_session(user_id, fon, data["occasion"], message_text, cacheable=True)
 
-    await call.message.delete()
+    try:
+        await call.message.delete()
+    except TelegramBadRequest:
+        # сообщение уже удалено — продолжаем, статус отправляется новым сообщением
+        pass
 
-    status_msg = await call.message.answer("Минуточку, идет процесс создания открытки")
+    status_msg = await call.message.answer(status_text("Минуточку, идет процесс создания открытки"))
     try:
-        await asyncio.to_thread(
-            pic_creator,
-            image_files[data["image"]],
-            data["occasion"],
-            text_list[ind],
-            user_id
-        )
+        # первый стиль показываем сразу, остальные дорисуются в фоне
+        first_card = await session.get(0)
+        session.start_background()
         logger.info(
             "Открытка успешно создана | пользователь=%s | режим=готовый_текст",
             user_id
         )
+    except asyncio.CancelledError:
+        # сессию заменил более новый запрос пользователя — у него свой статус
+        await discard_status(status_msg)
+        raise
+    except RenderQueueFull:
+        logger.warning(
+            "Очередь генерации заполнена | пользователь=%s",
+            user_id
+        )
+        drop_session(user_id)
+        await call.message.answer(BUSY_TEXT)
+        return
     except Exception:
         logger.exception(
             "Ошибка при создании открытки | пользователь=%s",
             user_id
         )
+        drop_session(user_id)
         await call.message.answer("Ошибка при создании открытки 😔")
         return
-    list_image = get_user_images(user_id)
-    if not list_image:
-        await call.message.answer("Нет изображений")
-        return
     await state.set_state(StateImage.index_preview)
     await state.update_data(prev=0)
+    if settings.CARD_DELIVERY == "album":
+        await call.answer()
+        session.attach(asyncio.create_task(send_album(status_msg, session)))
+        return
 
-    media = InputMediaPhoto(media=FSInputFile(list_image[0]))
+    media = InputMediaPhoto(media=card_input_file(first_card))
     try:
-        await status_msg.edit_media(media=media, reply_markup=select_image_first())
+        edited = await status_msg.edit_media(media=media, reply_markup=preview_keyboard(session))
     except TelegramBadRequest:
         return
+    await remember_card(first_card, edited, session, 0)
+    # остальные стили дорисовываются — счётчик на кнопке обновляется по мере готовности
+    session.attach(asyncio.create_task(show_progress(edited, session)))
     await call.answer()
\ No newline at end of file
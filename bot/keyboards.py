@@ -6,21 +6,36 @@ Inline-клавиатуры Telegram-бота для создания откры
 - выбора режима текста
 - выбора повода
 - навигации по текстам и изображениям
+- выбора открытки из альбома
 """
 from aiogram.types import InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 
 
-def select_image_first():
+def _next_text(progress: str | None) -> str:
+    # progress — счётчик готовых открыток, пока остальные ещё генерируются
+    return f'Следующая ({progress})' if progress else 'Следующая'
+
+
+def select_image_first(progress: str | None = None):
+    kb = InlineKeyboardBuilder()
+    kb.row(InlineKeyboardButton(text='Выбрать', callback_data='select'), InlineKeyboardButton(text=_next_text(progress), callback_data='next'))
+    return kb.as_markup()
+
+
+def select_image(progress: str | None = None):
     kb = InlineKeyboardBuilder()
-    kb.row(InlineKeyboardButton(text='Выбрать', callback_data='select'), InlineKeyboardButton(text='Следующая', callback_data='next'))
+    kb.row(InlineKeyboardButton(text='Назад', callback_data='back'), InlineKeyboardButton(text='Выбрать', callback_data='select') ,InlineKeyboardButton(text=_next_text(progress), callback_data='next'))
     return kb.as_markup()
 
 
-def select_image():
+def select_style(indices: list[int], per_row: int = 4):
+    # кнопка с номером открытки в альбоме, callback — номер стиля
     kb = InlineKeyboardBuilder()
-    kb.row(InlineKeyboardButton(text='Назад', callback_data='back'), InlineKeyboardButton(text='Выбрать', callback_data='select') ,InlineKeyboardButton(text='Следующая', callback_data='next'))
+    for position, index in enumerate(indices, start=1):
+        kb.button(text=str(position), callback_data=f'style_{index}')
+    kb.adjust(per_row)
     return kb.as_markup()
 
 
@@ -0,0 +1,96 @@
+"""
+Middleware бота: метрики и ограничение нагрузки.
+
+Назначение:
+- HandlerMetricsMiddleware — время работы каждого хендлера
+  (метка — имя функции хендлера)
+- TelegramApiMetricsMiddleware — время каждого вызова Telegram Bot API
+  (метка — имя метода API)
+- ConcurrencyLimitMiddleware — ограничение числа одновременно
+  обрабатываемых апдейтов (polling и webhook)
+
+Подключаются в main.py.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+
+from services.metrics import HANDLER_LATENCY, TELEGRAM_API_LATENCY
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренняя middleware роутера: вызывается после фильтров,
+    когда хендлер уже выбран.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        with HANDLER_LATENCY.time(handler=name):
+            return await handler(event, data)
+
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота: оборачивает каждый запрос к Telegram API.
+    """
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            TELEGRAM_API_LATENCY.observe(
+                time.perf_counter() - started, method=method.__api_method__
+            )
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware апдейтов: одновременно обрабатывается
+    не больше limit апдейтов, остальные ждут своей очереди.
+    Считает апдейты в работе, чтобы при остановке дождаться их завершения.
+    """
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            async with self._semaphore:
+                return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Ждёт завершения всех апдейтов в работе. False — не дождались за timeout.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
@@ -0,0 +1,116 @@
+"""
+Режим polling (getUpdates).
+
+Назначение:
+- Получение апдейтов long polling'ом
+- Ограничение числа одновременно обрабатываемых апдейтов
+  (ConcurrencyLimitMiddleware, как в режиме webhook)
+- Плавная остановка по SIGINT / SIGTERM: новые апдейты не запрашиваются,
+  апдейты в работе дорабатывают, и только затем диспетчер закрывает
+  хранилище FSM и сессию бота
+
+Dispatcher.start_polling закрывает хранилище и сессию сразу после остановки
+опроса, не дожидаясь задач апдейтов, поэтому цикл опроса здесь свой.
+Апдейты, которые не успели подтвердить (offset), Telegram отдаст
+после перезапуска повторно.
+
+Точка входа:
+    await run_polling(dp, bot, on_idle)
+"""
+
+import asyncio
+import logging
+import signal
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from bot.middlewares import ConcurrencyLimitMiddleware
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# long polling: сколько Telegram держит запрос getUpdates без апдейтов, секунд
+POLLING_TIMEOUT = 10
+# пауза перед повтором getUpdates после ошибки, секунд
+RETRY_DELAY = 5
+
+
+async def run_polling(
+    dp: Dispatcher, bot: Bot, on_idle: Callable[[], Awaitable[None]] | None = None
+) -> None:
+    """
+    Получает апдейты до сигнала остановки.
+    on_idle вызывается, когда апдейты в работе завершились,
+    до закрытия хранилища FSM и сессии бота.
+    """
+    limiter = ConcurrencyLimitMiddleware(settings.UPDATE_CONCURRENCY)
+    dp.update.outer_middleware(limiter)
+
+    # getUpdates не работает, пока у бота установлен webhook
+    await bot.delete_webhook()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    tasks: set[asyncio.Task] = set()
+    polling = asyncio.create_task(_poll(dp, bot, tasks))
+    stopped = asyncio.create_task(stop.wait())
+    logger.info("Polling запущен")
+    try:
+        await asyncio.wait({polling, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if polling.done():
+            polling.result()
+    finally:
+        # новые апдейты не запрашиваются, начатые дорабатывают
+        polling.cancel()
+        stopped.cancel()
+        await asyncio.gather(polling, stopped, return_exceptions=True)
+        logger.info("Остановка polling: ждём апдейты в работе (%s)", limiter.in_flight)
+        if not await limiter.wait_idle(settings.SHUTDOWN_TIMEOUT):
+            logger.warning("Не дождались апдейтов в работе: %s", limiter.in_flight)
+        try:
+            if on_idle is not None:
+                await on_idle()
+        finally:
+            # закрывает хранилище FSM (shutdown диспетчера) и сессию бота
+            await dp.emit_shutdown(bot=bot, dispatcher=dp)
+            await bot.session.close()
+
+
+async def _poll(dp: Dispatcher, bot: Bot, tasks: set[asyncio.Task]) -> None:
+    """
+    Цикл getUpdates: каждый апдейт обрабатывается в своей задаче.
+    """
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=POLLING_TIMEOUT,
+                allowed_updates=allowed_updates,
+                request_timeout=int(bot.session.timeout + POLLING_TIMEOUT),
+            )
+        except Exception as e:
+            logger.error("Не удалось получить апдейты: %s: %s", type(e).__name__, e)
+            await asyncio.sleep(RETRY_DELAY)
+            continue
+
+        for update in updates:
+            # апдейт подтверждается следующим запросом getUpdates
+            offset = update.update_id + 1
+            task = asyncio.create_task(_handle(dp, bot, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+
+async def _handle(dp: Dispatcher, bot: Bot, update: Update) -> None:
+    try:
+        await dp.feed_update(bot, update)
+    except Exception:
+        logger.exception("Ошибка обработки апдейта %s", update.update_id)
@@ -0,0 +1,203 @@
+"""
+Постоянное хранилище FSM на SQLite.
+
+Назначение:
+- Сохранение состояний и данных FSM между перезапусками бота
+- Удаление брошенных сессий по TTL (пользователь ушёл посреди сценария)
+- Счётчики сессий для метрик
+
+Хранение:
+- одна строка на пользователя: состояние, данные (компактный JSON), срок жизни
+- пустая сессия (state.clear()) удаляется сразу
+- строка с истёкшим сроком считается пустой и удаляется
+  при чтении или фоновым проходом
+
+Подключается в bot/bot.py (FSM_STORAGE=sqlite).
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from services.metrics import FSM_SESSIONS_EXPIRED
+
+logger = logging.getLogger(__name__)
+
+# фоновый проход удаляет истёкшие записи пачками, отпуская блокировку
+# между ними: чтение и запись FSM не ждут удаления всей таблицы
+SWEEP_BATCH = 500
+SWEEP_PAUSE = 0.005
+
+
+def _storage_key(key: StorageKey) -> str:
+    return ":".join(
+        str(part) if part is not None else ""
+        for part in (
+            key.bot_id, key.chat_id, key.user_id,
+            key.thread_id, key.business_connection_id, key.destiny,
+        )
+    )
+
+
+def _dumps(data: Mapping[str, Any]) -> bytes | None:
+    # без пробелов и без \uXXXX: кириллица в UTF-8 вдвое-втрое короче
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM в SQLite с TTL.
+
+    Каждая запись живёт ttl секунд с момента последнего изменения.
+    Фоновый проход (start_sweeper) раз в sweep_interval секунд
+    удаляет истёкшие записи.
+    """
+
+    def __init__(self, db_path: Path, ttl: float, sweep_interval: float = 600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._sweeper: asyncio.Task | None = None
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        # WAL без fsync на каждую запись: запись занимает микросекунды
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data BLOB, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS fsm_expires_at ON fsm (expires_at)")
+        # отдельное соединение только для чтения — счётчики для метрик:
+        # полный подсчёт не держит блокировку, которую ждут апдейты
+        # (в WAL чтение идёт параллельно с записью)
+        self._reader = sqlite3.connect(
+            f"{db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._reader_lock = threading.Lock()
+
+    # ===== BaseStorage =====
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        _, data = self._read(_storage_key(key))
+        self._write(_storage_key(key), state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return self._read(_storage_key(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, Mapping):
+            raise TypeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        state, _ = self._read(_storage_key(key))
+        self._write(_storage_key(key), state, _dumps(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        data = self._read(_storage_key(key))[1]
+        return json.loads(data) if data else {}
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        with self._lock:
+            self._db.close()
+        with self._reader_lock:
+            self._reader.close()
+
+    # ===== TTL =====
+    def start_sweeper(self) -> None:
+        """
+        Запускает фоновое удаление истёкших сессий.
+        """
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    def sweep(self) -> int:
+        """
+        Удаляет истёкшие сессии пачками по SWEEP_BATCH.
+        Возвращает количество удалённых.
+        """
+        now = time.time()
+        removed = 0
+        while True:
+            with self._lock:
+                batch = self._db.execute(
+                    "DELETE FROM fsm WHERE key IN "
+                    "(SELECT key FROM fsm WHERE expires_at <= ? LIMIT ?)",
+                    (now, SWEEP_BATCH),
+                ).rowcount
+            removed += batch
+            FSM_SESSIONS_EXPIRED.inc(batch)
+            if batch < SWEEP_BATCH:
+                return removed
+            # даём апдейтам взять блокировку между пачками
+            time.sleep(SWEEP_PAUSE)
+
+    def count_sessions(self) -> int:
+        """
+        Количество живых сессий с установленным состоянием.
+        Вызывается из метрик вне event loop.
+        """
+        with self._reader_lock:
+            return self._reader.execute(
+                "SELECT COUNT(*) FROM fsm WHERE state IS NOT NULL AND expires_at > ?",
+                (time.time(),),
+            ).fetchone()[0]
+
+    def count_rows(self) -> int:
+        with self._reader_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM fsm").fetchone()[0]
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Ошибка очистки FSM-сессий")
+                continue
+            if removed:
+                logger.info("Удалены брошенные FSM-сессии | количество=%s", removed)
+
+    # ===== SQLite =====
+    def _read(self, key: str) -> tuple[str | None, bytes | None]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state, data, expires_at FROM fsm WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        if row[2] <= time.time():
+            self._expire(key)
+            return None, None
+        return row[0], row[1]
+
+    def _expire(self, key: str) -> None:
+        with self._lock:
+            # запись могла быть перезаписана после чтения
+            removed = self._db.execute(
+                "DELETE FROM fsm WHERE key = ? AND expires_at <= ?", (key, time.time())
+            ).rowcount
+        FSM_SESSIONS_EXPIRED.inc(removed)
+
+    def _write(self, key: str, state: str | None, data: bytes | None) -> None:
+        with self._lock:
+            if state is None and data is None:
+                self._db.execute("DELETE FROM fsm WHERE key = ?", (key,))
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO fsm (key, state, data, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, state, data, time.time() + self.ttl),
+                )
@@ -0,0 +1,91 @@
+"""
+Режим webhook на aiohttp.
+
+Назначение:
+- Приём апдейтов от Telegram по HTTP вместо polling
+- Проверка секретного токена (X-Telegram-Bot-Api-Secret-Token):
+  без WEBHOOK_SECRET режим не запускается, иначе апдейты
+  может прислать кто угодно, кто знает адрес
+- Ограничение числа одновременно обрабатываемых апдейтов
+- Плавная остановка по SIGINT / SIGTERM: новые апдейты не принимаются,
+  апдейты в работе дорабатывают
+
+Несколько экземпляров бота можно поставить за балансировщик:
+состояние FSM общее (SQLite на общем диске), генерация у каждого своя.
+
+Точка входа:
+    await run_webhook(dp, bot, on_idle)
+"""
+
+import asyncio
+import logging
+import signal
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.middlewares import ConcurrencyLimitMiddleware
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def run_webhook(
+    dp: Dispatcher, bot: Bot, on_idle: Callable[[], Awaitable[None]] | None = None
+) -> None:
+    """
+    Запускает HTTP-сервер webhook и работает до сигнала остановки.
+    on_idle вызывается, когда апдейты в работе завершились,
+    до закрытия хранилища FSM и сессии бота.
+    """
+    if not settings.WEBHOOK_SECRET:
+        raise RuntimeError("Режим webhook требует WEBHOOK_SECRET")
+
+    limiter = ConcurrencyLimitMiddleware(settings.UPDATE_CONCURRENCY)
+    dp.update.outer_middleware(limiter)
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET,
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    await site.start()
+    logger.info(
+        "Webhook слушает %s:%s%s", settings.WEBHOOK_HOST, settings.WEBHOOK_PORT, settings.WEBHOOK_PATH
+    )
+
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            max_connections=min(100, settings.UPDATE_CONCURRENCY),
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Остановка webhook: ждём апдейты в работе (%s)", limiter.in_flight)
+        # новые апдейты не принимаются, начатые дорабатывают
+        await site.stop()
+        if not await limiter.wait_idle(settings.SHUTDOWN_TIMEOUT):
+            logger.warning("Не дождались апдейтов в работе: %s", limiter.in_flight)
+        try:
+            if on_idle is not None:
+                await on_idle()
+        finally:
+            # закрывает хранилище FSM и сессию бота (shutdown диспетчера)
+            await runner.cleanup()
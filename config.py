@@ -6,7 +6,13 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 и другие константы, используемые в боте.
 """
 
+import hashlib
+import json
+import logging
 from pathlib import Path
+from typing import Literal, NamedTuple
+
+from pydantic import field_validator
 
 
 # для указания пути к .env. без этого конфиг не работал/ тфк же если .env находится в той же папке что и config  то прописываем путь Path(__file__).resolve().parent если config глубже env то прописываем Path(__file__).resolve().parent.parent
@@ -17,19 +23,149 @@ ENV_FILE = BASE_DIR / ".env"
 class Settings(BaseSettings):
 
     BOT: str
+    # адрес Bot API: пусто — api.telegram.org;
+    # для нагрузочного теста — локальный tools.fake_telegram
+    TELEGRAM_API_URL: str = ""
+    # служебные данные: FSM, кэш file_id, кэш открыток
+    # (нагрузочный тест подставляет отдельную папку — file_id фейкового API не попадают в рабочие кэши)
+    DATA_DIR: Path = BASE_DIR / "data"
+    # сколько первых фонов декодировать в память при старте (0 — не прогревать)
+    BACKGROUND_WARMUP: int = 0
+    # число процессов генерации (0 — по числу ядер) и длина очереди задач
+    RENDER_WORKERS: int = 0
+    RENDER_QUEUE_SIZE: int = 32
+    # формат готовых открыток: PNG / JPEG / WEBP (без учёта регистра); OUTPUT_IN_MEMORY — без записи на диск
+    OUTPUT_FORMAT: Literal["PNG", "JPEG", "WEBP"] = "PNG"
+    OUTPUT_QUALITY: int = 90
+    OUTPUT_PNG_COMPRESS_LEVEL: int = 6
+    OUTPUT_IN_MEMORY: bool = False
+    # показ готовых открыток: carousel — первая сразу, остальные листаются по одной;
+    # album — все стили одним альбомом (sendMediaGroup) и кнопки выбора стиля
+    CARD_DELIVERY: Literal["carousel", "album"] = "carousel"
+    # объём кэша готовых открыток (DATA_DIR/card_cache)
+    CARD_CACHE_MAX_MB: int = 512
+    # папка output: папки ушедших пользователей удаляются через OUTPUT_MAX_AGE_HOURS,
+    # при превышении OUTPUT_QUOTA_MB — самые старые
+    OUTPUT_MAX_AGE_HOURS: float = 24
+    OUTPUT_QUOTA_MB: int = 1024
+    OUTPUT_SWEEP_SECONDS: int = 600
+    # сессия предпросмотра (готовые открытки в памяти) удаляется,
+    # если пользователь не обращался к ней SESSION_TTL_MINUTES
+    SESSION_TTL_MINUTES: float = 30
+    # хранилище FSM: sqlite (DATA_DIR/fsm.sqlite3, переживает перезапуск) или memory;
+    # брошенные сессии удаляются через FSM_TTL_HOURS после последнего действия
+    FSM_STORAGE: Literal["sqlite", "memory"] = "sqlite"
+    FSM_TTL_HOURS: float = 24
+    FSM_SWEEP_SECONDS: int = 600
+    # режим получения апдейтов: polling или webhook
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    # webhook: бот слушает WEBHOOK_HOST:WEBHOOK_PORT/WEBHOOK_PATH;
+    # WEBHOOK_URL — публичный адрес (https://example.com), если пусто — setWebhook не вызывается
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_URL: str = ""
+    WEBHOOK_SECRET: str = ""
+    # сколько апдейтов обрабатывается одновременно (оба режима)
+    UPDATE_CONCURRENCY: int = 64
+    # сколько ждать апдейты и генерацию в работе при остановке, секунд
+    SHUTDOWN_TIMEOUT: float = 30
+    # эндпоинт метрик Prometheus http://METRICS_HOST:METRICS_PORT/metrics (0 — выключен)
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 0
     model_config = SettingsConfigDict(env_file=str(ENV_FILE),
                                       env_file_encoding="utf-8")
 
+    @field_validator("OUTPUT_FORMAT", mode="before")
+    @classmethod
+    def _output_format_upper(cls, value):
+        # png и PNG — один формат (и один ключ кэша открыток)
+        return value.upper() if isinstance(value, str) else value
+
 settings = Settings()
 
 OUTPUT_DIR = BASE_DIR / "output"
 IMAGES_DIR = BASE_DIR / "assets" / "previews"
+BROWSE_DIR = BASE_DIR / "assets" / "browse"
+CATALOGUE_PATH = BASE_DIR / "assets" / "catalogue.json"
+
+
+class BackgroundImage(NamedTuple):
+    """
+    Фон открытки из каталога (готовит tools/prepare_image.py).
+
+    id — стабильный идентификатор (не зависит от порядка файлов и машины),
+    browse — маленькое превью для листания фонов,
+    full — полный размер для генерации открыток,
+    sha256 / browse_sha256 — хэши содержимого (пусто, если каталога нет),
+    file_ids — известные file_id Telegram: {"full": ..., "browse": ...}.
+    """
+    id: str
+    full: Path
+    browse: Path
+    width: int = 0
+    height: int = 0
+    orientation: str = ""
+    size: int = 0
+    sha256: str = ""
+    browse_sha256: str = ""
+    file_ids: dict[str, str] = {}
+
+
+def _background_id(name: str) -> str:
+    # та же формула, что в tools/prepare_image.py
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()[:10]
+
+
+def _load_catalogue() -> list[BackgroundImage]:
+    """
+    Загружает каталог фонов одним чтением файла.
+    Если каталога ещё нет — собирает список из папки превью (без размеров и хэшей).
+    """
+    try:
+        entries = json.loads(CATALOGUE_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        logging.getLogger(__name__).warning(
+            "Каталог фонов %s не найден, запустите tools/prepare_image.py", CATALOGUE_PATH.name
+        )
+        backgrounds = []
+        for p in sorted(IMAGES_DIR.iterdir()):
+            if p.suffix.lower() in (".jpg", ".jpeg", ".png"):
+                # browse-варианта ещё нет — листаем полный размер
+                browse = BROWSE_DIR / p.name
+                backgrounds.append(BackgroundImage(
+                    id=_background_id(p.name), full=p, browse=browse if browse.exists() else p
+                ))
+        return backgrounds
+
+    return [
+        BackgroundImage(
+            id=entry["id"],
+            full=IMAGES_DIR / entry["file"],
+            browse=BROWSE_DIR / entry["browse"] if entry["browse"] else IMAGES_DIR / entry["file"],
+            width=entry["width"],
+            height=entry["height"],
+            orientation=entry["orientation"],
+            size=entry["bytes"],
+            sha256=entry["sha256"],
+            browse_sha256=entry["browse_sha256"] or entry["sha256"],
+            file_ids={tier: file_id for tier, file_id in entry["file_ids"].items() if file_id},
+        )
+        for entry in entries
+    ]
+
+
+image_files = _load_catalogue()
+backgrounds_by_id = {background.id: background for background in image_files}
+background_positions = {background.id: i for i, background in enumerate(image_files)}
+
 
+def find_background(image_id: str | None) -> BackgroundImage:
+    """
+    Возвращает фон по id. Неизвестный id (фон удалён из каталога) — первый фон.
+    """
+    return backgrounds_by_id.get(image_id) or image_files[0]
 
-image_files = [
-    p for p in IMAGES_DIR.iterdir()
-    if p.suffix.lower() in (".jpg", ".jpeg", ".png")
-]
 
 # словарь для файла хендлерс. с темами для текста открыток. словарь содержит ключ - колбак от кнопки выбора повода и значение словарь заголовок поздравления и имя файла с текстом под нужный повод
 OCCASIONS = {
@@ -2,11 +2,25 @@
 Точка входа Telegram-бота для создания поздравительных открыток.
 
 Настраивает логирование, регистрирует роутеры
-и запускает бота в режиме polling.
+и запускает бота в режиме polling или webhook (BOT_MODE).
+
+При остановке дожидается апдейтов в работе и генерации открыток,
+уже отправленных в пул, и только затем закрывает хранилище FSM и сессию бота.
 """
 import asyncio
 from bot.bot import dp, bot
+from bot.storage import SQLiteStorage
+from bot.polling import run_polling
+from bot.webhook import run_webhook
 from bot.handlers import router
+from bot.middlewares import HandlerMetricsMiddleware, TelegramApiMetricsMiddleware
+from config import image_files, settings
+from services.file_id_cache import preview_file_ids
+from services.file_storage import output_dir_size
+from services.metrics import registry, start_metrics_server
+from services.card_session import drop_all_sessions, is_active, session_count, start_sweeper
+from services.render_engine import render_engine
+from services.storage_manager import output_storage
 import logging
 
 logging.basicConfig(
@@ -16,10 +30,85 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+def active_fsm_sessions() -> int:
+    """
+    Количество пользователей с активным состоянием FSM.
+    """
+    if isinstance(dp.storage, SQLiteStorage):
+        return dp.storage.count_sessions()
+    storage = getattr(dp.storage, "storage", {})
+    return sum(1 for record in list(storage.values()) if record.state is not None)
+
+
+def setup_metrics() -> None:
+    router.message.middleware(HandlerMetricsMiddleware())
+    router.callback_query.middleware(HandlerMetricsMiddleware())
+    bot.session.middleware(TelegramApiMetricsMiddleware())
+
+    registry.gauge("bot_fsm_sessions_active", "Users with an active FSM state", active_fsm_sessions)
+    registry.gauge("bot_output_dir_bytes", "Disk usage of the output directory", output_dir_size)
+    registry.gauge("bot_card_sessions", "Card preview sessions held in memory", session_count)
+    if isinstance(dp.storage, SQLiteStorage):
+        registry.gauge("bot_fsm_sessions_stored", "FSM rows in SQLite, including expired", dp.storage.count_rows)
+
+
+def seed_catalogue_file_ids() -> None:
+    """
+    Подставляет file_id из каталога фонов (assets/catalogue.json)
+    для фонов, которые этот экземпляр бота ещё не отправлял.
+    """
+    for background in image_files:
+        for tier, path, content_hash in (
+            ("full", background.full, background.sha256),
+            ("browse", background.browse, background.browse_sha256),
+        ):
+            file_id = background.file_ids.get(tier)
+            if file_id and content_hash:
+                preview_file_ids.seed(path, content_hash, file_id)
+
+
+async def stop_rendering() -> None:
+    """
+    Останавливает генерацию: новые стили не запускаются,
+    открытки в работе дорисовываются.
+    """
+    drop_all_sessions()
+    if not await render_engine.drain(settings.SHUTDOWN_TIMEOUT):
+        logger.warning("Остановка без ожидания генерации: в пуле %s задач", render_engine.pending)
+
+
 async def main():
     dp.include_router(router)
+    seed_catalogue_file_ids()
+
+    metrics_runner = None
+    if settings.METRICS_PORT:
+        setup_metrics()
+        metrics_runner = await start_metrics_server(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    if isinstance(dp.storage, SQLiteStorage):
+        # брошенные сессии удаляются по TTL; хранилище закрывает диспетчер при остановке
+        dp.storage.start_sweeper()
+    # брошенные сессии предпросмотра удаляются через SESSION_TTL_MINUTES
+    start_sweeper()
+    # папки пользователей, недавно открывавших предпросмотр, не удаляются
+    output_storage.start_sweeper(is_active)
 
-    await dp.start_polling(bot)
+    # рабочие процессы генерации прогревают фоны сами (BACKGROUND_WARMUP)
+    render_engine.start()
+    try:
+        # генерация останавливается после апдейтов в работе,
+        # но до закрытия хранилища FSM и сессии бота
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(dp, bot, on_idle=stop_rendering)
+        else:
+            await run_polling(dp, bot, on_idle=stop_rendering)
+    finally:
+        await output_storage.stop()
+        await asyncio.to_thread(render_engine.shutdown)
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Пул декодированных фоновых изображений.
+
+Назначение:
+- Хранение фонов в памяти уже декодированными (RGBA)
+- Исключение повторного чтения и декодирования JPEG / PNG
+  при каждой генерации открытки
+
+Особенности:
+- Вытеснение по LRU с ограничением по суммарному объёму (w * h * 4 байт)
+- Предварительная загрузка (прогрев) выбранных фонов
+- Вызывающий код всегда получает копию — кэшированное
+  изображение никогда не изменяется
+- Изменённый на диске файл декодируется заново (ключ учитывает mtime)
+
+Точка входа:
+    get_background(path)
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# ===== SETTINGS =====
+POOL_MAX_BYTES = 192 * 1024 * 1024
+
+
+def _image_bytes(img: Image.Image) -> int:
+    w, h = img.size
+    return w * h * 4
+
+
+class BackgroundPool:
+    """
+    LRU-пул декодированных фонов с ограничением по объёму памяти.
+    Потокобезопасен: генерация запускается из рабочих потоков.
+    """
+
+    def __init__(self, max_bytes: int = POOL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images: OrderedDict[tuple[str, int], Image.Image] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> Image.Image:
+        """
+        Возвращает копию декодированного фона.
+        При промахе декодирует файл и кладёт его в пул.
+        """
+        key = (str(path), path.stat().st_mtime_ns)
+
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return img.copy()
+            self.misses += 1
+
+        img = self._decode(path)
+        self._put(key, img)
+        return img.copy()
+
+    def warm_up(self, paths: list[Path]) -> int:
+        """
+        Заранее декодирует переданные фоны.
+        Возвращает количество загруженных изображений.
+        """
+        loaded = 0
+        for path in paths:
+            key = (str(path), path.stat().st_mtime_ns)
+            with self._lock:
+                if key in self._images:
+                    continue
+            if self._put(key, self._decode(path)):
+                loaded += 1
+        return loaded
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "images": len(self._images),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self.total_bytes = 0
+
+    @staticmethod
+    def _decode(path: Path) -> Image.Image:
+        with Image.open(path) as src:
+            return src.convert("RGBA")
+
+    def _put(self, key: tuple[str, int], img: Image.Image) -> bool:
+        size = _image_bytes(img)
+        if size > self.max_bytes:
+            logger.warning("Фон %s не помещается в пул (%s байт)", key[0], size)
+            return False
+
+        with self._lock:
+            # устаревшие версии того же файла больше не нужны
+            for old_key in [k for k in self._images if k[0] == key[0] and k != key]:
+                self.total_bytes -= _image_bytes(self._images.pop(old_key))
+
+            if key in self._images:
+                self._images.move_to_end(key)
+                return True
+
+            self._images[key] = img
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.total_bytes -= _image_bytes(evicted)
+        return True
+
+
+background_pool = BackgroundPool()
+
+
+def get_background(path: Path) -> Image.Image:
+    """
+    Возвращает копию декодированного фона из общего пула.
+    """
+    return background_pool.get(path)
@@ -0,0 +1,214 @@
+"""
+Кэш готовых открыток с адресацией по содержимому.
+
+Назначение:
+- Повторное использование открыток, одинаковых для всех пользователей
+  (готовые тексты из texts/ и заголовки из OCCASIONS)
+- Пропуск генерации при попадании в кэш
+- Хранение file_id Telegram после первой отправки открытки
+
+Ключ кэша — sha256 от:
+- хэша содержимого фона
+- заголовка и текста
+- стиля
+- версии отрисовки (RENDERER_VERSION)
+- параметров кодирования
+
+Хранение:
+- закодированные открытки — файлы в data/card_cache
+- индекс (размер, file_id, время последнего использования) — SQLite
+- объём ограничен, при превышении удаляются давно не использованные открытки
+
+Точка входа:
+    card_cache.make_key(...) / card_cache.get(key) / card_cache.put(key, card)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, replace
+from pathlib import Path
+
+from config import settings
+from services.file_id_cache import DATA_DIR, cached_file_hash
+from services.image_generator_v3 import RENDERER_VERSION, OutputFormat, RenderedCard
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ===== SETTINGS =====
+CARD_CACHE_DIR = DATA_DIR / "card_cache"
+CARD_CACHE_MAX_BYTES = settings.CARD_CACHE_MAX_MB * 1024 * 1024
+
+
+class CardCache:
+    """
+    Кэш открыток с LRU-вытеснением по суммарному объёму файлов.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = CARD_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(cache_dir / "index.sqlite3", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            "key TEXT PRIMARY KEY, style_id TEXT NOT NULL, filename TEXT NOT NULL, "
+            "size INTEGER NOT NULL, file_id TEXT, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+        self.total_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cards"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(
+        background: Path,
+        title: str,
+        message: str | None,
+        style_id: str,
+        output: OutputFormat,
+    ) -> str:
+        """
+        Вычисляет ключ кэша для открытки.
+        """
+        payload = json.dumps(
+            [
+                cached_file_hash(background),
+                title,
+                message,
+                style_id,
+                RENDERER_VERSION,
+                asdict(replace(output, in_memory=False)),
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> RenderedCard | None:
+        """
+        Возвращает открытку из кэша или None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT style_id, filename, size, file_id FROM cards WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            style_id, filename, size, file_id = row
+            path = self._path(key, filename)
+            if not path.exists():
+                self._delete(key, size)
+                self._db.commit()
+                self.misses += 1
+                return None
+
+            self._db.execute("UPDATE cards SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.hits += 1
+
+        return RenderedCard(
+            style_id=style_id,
+            filename=filename,
+            path=path,
+            data=None,
+            encode_seconds=0.0,
+            size=size,
+            file_id=file_id,
+            cache_key=key,
+        )
+
+    def contains(self, key: str) -> bool:
+        """
+        Проверяет наличие открытки в кэше, не влияя на статистику и LRU.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT filename FROM cards WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and self._path(key, row[0]).exists()
+
+    def put(self, key: str, card: RenderedCard) -> RenderedCard:
+        """
+        Сохраняет открытку в кэш.
+        Возвращает ту же открытку с проставленным ключом кэша.
+        """
+        data = card.data if card.data is not None else card.path.read_bytes()
+        if len(data) > self.max_bytes:
+            return card
+
+        path = self._path(key, card.filename)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+        with self._lock:
+            old = self._db.execute("SELECT size FROM cards WHERE key = ?", (key,)).fetchone()
+            if old:
+                self.total_bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO cards (key, style_id, filename, size, file_id, last_used) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                (key, card.style_id, card.filename, len(data), time.time()),
+            )
+            self.total_bytes += len(data)
+            self._evict()
+            self._db.commit()
+
+        return replace(card, cache_key=key)
+
+    def set_file_id(self, key: str, file_id: str) -> None:
+        """
+        Запоминает file_id открытки после её первой отправки.
+        """
+        with self._lock:
+            self._db.execute("UPDATE cards SET file_id = ? WHERE key = ?", (file_id, key))
+            self._db.commit()
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _path(self, key: str, filename: str) -> Path:
+        return self.cache_dir / f"{key}{Path(filename).suffix}"
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM cards ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.total_bytes = 0
+                return
+            self._delete(*row)
+
+    def _delete(self, key: str, size: int) -> None:
+        row = self._db.execute("SELECT filename FROM cards WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._path(key, row[0]).unlink(missing_ok=True)
+        self._db.execute("DELETE FROM cards WHERE key = ?", (key,))
+        self.total_bytes -= size
+
+
+card_cache = CardCache(CARD_CACHE_DIR)
+
+registry.gauge("card_cache_hits", "Card cache hits since start", lambda: card_cache.hits)
+registry.gauge("card_cache_misses", "Card cache misses since start", lambda: card_cache.misses)
+registry.gauge("card_cache_hit_rate", "Card cache hit rate since start", lambda: card_cache.stats()["hit_rate"])
+registry.gauge("card_cache_bytes", "Size of cached card files", lambda: card_cache.total_bytes)
@@ -0,0 +1,376 @@
+"""
+Сессии генерации открыток пользователей.
+
+Назначение:
+- Показ первой открытки сразу после её генерации,
+  не дожидаясь остальных стилей
+- Фоновая генерация остальных стилей одной задачей пула
+  (render_engine.render_styles: разметка и маски текста общие),
+  открытки приходят по мере готовности
+- Генерация по запросу, если пользователь пролистал
+  к стилю, который ещё не начат
+
+У каждого стиля есть своя задача или ожидание (future), которое
+закрывает фоновая генерация. Навигация ожидает его, поэтому открытка
+«в процессе» дожидается готовности, а не считается отсутствующей.
+
+Готовые открытки хранятся в сессии списком в порядке STYLES
+(байты или путь, стиль, file_id после первой отправки) —
+навигация не обращается к файловой системе, а повторный показ
+открытки идёт по file_id без новой загрузки.
+
+Открытки с готовыми текстами (cacheable) сначала ищутся в card_cache,
+сгенерированные — сохраняются в него.
+
+stream() отдаёт открытки по мере готовности — по ним бот обновляет
+счётчик «3/7 готово» на кнопках, пока генерация продолжается.
+
+Повторный запрос той же открытки (двойной клик, повторное сообщение)
+присоединяется к уже идущей сессии, а не запускает генерацию заново.
+
+Сессия, к которой пользователь не обращался дольше SESSION_TTL_MINUTES,
+удаляется фоновым проходом (start_sweeper): пользователь ушёл с экрана
+предпросмотра, а открытки (с OUTPUT_IN_MEMORY — байты) остались бы в памяти.
+Вернувшийся пользователь получает открытки заново (restore_session в хендлерах).
+
+Точки входа:
+    start_session(user_id, fon, title, message)
+    find_session(user_id, fon, title, message)
+    get_session(user_id) / is_active(user_id)
+    drop_session(user_id) / drop_all_sessions()
+    start_sweeper()
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import AsyncIterator
+
+from config import settings
+from services.card_cache import card_cache
+from services.image_generator_v3 import STYLES, RenderedCard
+from services.render_engine import RenderQueueFull, render_engine
+
+logger = logging.getLogger(__name__)
+
+# пауза перед повтором фоновой генерации при заполненной очереди
+RETRY_DELAY = 1.0
+# сессия без обращений пользователя дольше SESSION_TTL удаляется
+SESSION_TTL = settings.SESSION_TTL_MINUTES * 60
+SWEEP_INTERVAL = 60
+
+
+class CardSession:
+    """
+    Набор открыток одного пользователя во всех стилях STYLES.
+    Порядок открыток совпадает с порядком STYLES.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        fon: Path,
+        title: str,
+        message: str | None,
+        cacheable: bool = False,
+    ):
+        self.user_id = user_id
+        self.fon = fon
+        self.title = title
+        self.message = message
+        self.cacheable = cacheable
+        self.styles = list(STYLES)
+        self.cards: list[RenderedCard | None] = [None] * len(self.styles)
+        # номер открытки, показанной пользователю (None — первая, до листания)
+        self.position: int | None = None
+        # время последнего обращения пользователя (time.monotonic)
+        self.last_used = time.monotonic()
+        self._jobs: dict[int, asyncio.Future[RenderedCard]] = {}
+        self._background: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.styles)
+
+    def matches(self, fon: Path, title: str, message: str | None) -> bool:
+        return (self.fon, self.title, self.message) == (fon, title, message)
+
+    def ensure(self, index: int) -> asyncio.Future[RenderedCard]:
+        """
+        Возвращает задачу генерации стиля, запуская её при необходимости.
+        Завершившаяся с ошибкой задача запускается заново отдельной задачей.
+        """
+        job = self._jobs.get(index)
+        if job is None or (job.done() and not job.cancelled() and job.exception()):
+            job = asyncio.create_task(self._render(index))
+            self._jobs[index] = job
+        return job
+
+    async def get(self, index: int) -> RenderedCard:
+        """
+        Возвращает открытку стиля, ожидая её готовности.
+        """
+        self.touch()
+        card = self.cards[index]
+        if card is not None:
+            return card
+        # общая задача стиля не отменяется вместе с одним из ожидающих
+        await asyncio.shield(self.ensure(index))
+        return self.cards[index]
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def is_ready(self, index: int) -> bool:
+        return self.cards[index] is not None
+
+    @property
+    def ready_count(self) -> int:
+        return sum(card is not None for card in self.cards)
+
+    @property
+    def finished(self) -> bool:
+        """
+        Все стили готовы или фоновая генерация завершилась (в том числе с ошибками).
+        """
+        return self.ready_count == len(self.cards) or (
+            self._background is not None and self._background.done()
+        )
+
+    async def stream(self) -> AsyncIterator[tuple[int, RenderedCard]]:
+        """
+        Отдаёт (номер стиля, открытка) по мере готовности,
+        начиная с уже готовых. Завершается, когда генерация закончена.
+        """
+        sent: set[int] = set()
+        while True:
+            self._changed.clear()
+            for index, card in enumerate(self.cards):
+                if card is not None and index not in sent:
+                    sent.add(index)
+                    yield index, card
+            if self.finished and len(sent) == self.ready_count:
+                return
+            await self._changed.wait()
+
+    def attach(self, task: asyncio.Task) -> None:
+        """
+        Привязывает к сессии вспомогательную задачу
+        (например, обновление счётчика готовности): она отменяется вместе с сессией.
+        """
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def remember_file_id(self, index: int, file_id: str) -> None:
+        """
+        Запоминает file_id отправленной открытки:
+        следующий показ пойдёт без повторной загрузки.
+        """
+        card = self.cards[index]
+        if card is not None and not card.file_id:
+            self.cards[index] = replace(card, file_id=file_id)
+
+    def start_background(self) -> None:
+        """
+        Запускает фоновую генерацию всех ещё не начатых стилей.
+        """
+        if self._background is None:
+            self._background = asyncio.create_task(self._render_rest())
+
+    def cancel(self) -> None:
+        if self._background:
+            self._background.cancel()
+        for job in self._jobs.values():
+            job.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _set_card(self, index: int, card: RenderedCard) -> None:
+        self.cards[index] = card
+        self._changed.set()
+
+    def _cache_key(self, index: int) -> str | None:
+        if not self.cacheable:
+            return None
+        return card_cache.make_key(
+            self.fon, self.title, self.message, self.styles[index], render_engine.output
+        )
+
+    def _cache_get(self, index: int) -> RenderedCard | None:
+        key = self._cache_key(index)
+        return card_cache.get(key) if key else None
+
+    def _cache_put(self, index: int, card: RenderedCard) -> RenderedCard:
+        key = self._cache_key(index)
+        return card_cache.put(key, card) if key else card
+
+    async def _from_cache(self, index: int) -> RenderedCard | None:
+        if not self.cacheable:
+            return None
+        # ключ — sha256 фона (при первом обращении файл читается целиком),
+        # индекс — SQLite с записью last_used: всё не на event loop
+        cached = await asyncio.to_thread(self._cache_get, index)
+        if cached:
+            self._set_card(index, cached)
+        return cached
+
+    async def _store(self, index: int, card: RenderedCard) -> RenderedCard:
+        if self.cacheable:
+            card = await asyncio.to_thread(self._cache_put, index, card)
+        self._set_card(index, card)
+        return card
+
+    async def _render(self, index: int) -> RenderedCard:
+        cached = await self._from_cache(index)
+        if cached:
+            return cached
+        card = await render_engine.render_style(
+            self.fon, self.title, self.message, self.user_id, self.styles[index]
+        )
+        return await self._store(index, card)
+
+    async def _render_rest(self) -> None:
+        try:
+            await self._render_all()
+        finally:
+            self._changed.set()
+
+    async def _render_all(self) -> None:
+        # все ещё не начатые стили — одна задача пула: пользователь занимает
+        # одно место в общей очереди, разметка и маски текста считаются один раз
+        rest = [
+            index for index in range(len(self.styles))
+            if index not in self._jobs and not await self._from_cache(index)
+        ]
+        # пока читался кэш, пользователь мог запросить стиль сам (ensure)
+        rest = [index for index in rest if index not in self._jobs]
+        if not rest:
+            return
+        loop = asyncio.get_running_loop()
+        waiting = {index: loop.create_future() for index in rest}
+        self._jobs.update(waiting)
+        try:
+            while True:
+                styles = [self.styles[index] for index in rest if not waiting[index].done()]
+                try:
+                    async for card in render_engine.render_styles(
+                        self.fon, self.title, self.message, self.user_id, styles
+                    ):
+                        index = self.styles.index(card.style_id)
+                        card = await self._store(index, card)
+                        if not waiting[index].done():
+                            waiting[index].set_result(card)
+                    break
+                except RenderQueueFull:
+                    await asyncio.sleep(RETRY_DELAY)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Ошибка фоновой генерации | пользователь=%s", self.user_id)
+        finally:
+            # не дорисованные стили при следующем обращении генерируются по одному (ensure)
+            for index, future in waiting.items():
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Стиль {self.styles[index]} не сгенерирован"))
+                    future.exception()
+
+
+_sessions: dict[int, CardSession] = {}
+_sweeper: asyncio.Task | None = None
+
+
+def start_session(
+    user_id: int,
+    fon: Path,
+    title: str,
+    message: str | None,
+    cacheable: bool = False,
+) -> CardSession:
+    """
+    Создаёт новую сессию генерации, отменяя предыдущую сессию пользователя.
+    cacheable — открытки одинаковы для всех пользователей и берутся из кэша.
+    """
+    drop_session(user_id)
+    session = CardSession(user_id, fon, title, message, cacheable)
+    _sessions[user_id] = session
+    return session
+
+
+def find_session(user_id: int, fon: Path, title: str, message: str | None) -> CardSession | None:
+    """
+    Возвращает сессию пользователя, если она создаёт ту же открытку.
+    """
+    session = _sessions.get(user_id)
+    if session and session.matches(fon, title, message):
+        session.touch()
+        return session
+    return None
+
+
+def get_session(user_id: int) -> CardSession | None:
+    return _sessions.get(user_id)
+
+
+def is_active(user_id: int) -> bool:
+    """
+    Есть ли у пользователя сессия, к которой он обращался за последние SESSION_TTL.
+    """
+    session = _sessions.get(user_id)
+    return session is not None and session.idle_seconds <= SESSION_TTL
+
+
+def session_count() -> int:
+    return len(_sessions)
+
+
+def drop_session(user_id: int) -> None:
+    session = _sessions.pop(user_id, None)
+    if session:
+        session.cancel()
+
+
+def drop_all_sessions() -> None:
+    """
+    Отменяет все сессии (при остановке бота): новые задачи генерации
+    не запускаются, уже отправленные в пул дорабатывают.
+    """
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        _sweeper = None
+    for user_id in list(_sessions):
+        drop_session(user_id)
+
+
+def expire_sessions() -> int:
+    """
+    Удаляет сессии без обращений дольше SESSION_TTL. Возвращает их количество.
+    """
+    expired = [user_id for user_id, session in _sessions.items() if session.idle_seconds > SESSION_TTL]
+    for user_id in expired:
+        drop_session(user_id)
+    return len(expired)
+
+
+def start_sweeper() -> None:
+    """
+    Запускает фоновое удаление брошенных сессий.
+    """
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.create_task(_sweep_loop())
+
+
+async def _sweep_loop() -> None:
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        expired = expire_sessions()
+        if expired:
+            logger.info("Удалены брошенные сессии предпросмотра | количество=%s", expired)
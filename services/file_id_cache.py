@@ -0,0 +1,161 @@
+"""
+Постоянный кэш file_id Telegram для отправляемых файлов.
+
+Назначение:
+- Повторное использование file_id, который Telegram возвращает
+  после первой загрузки файла
+- Исключение повторной загрузки одних и тех же превью фонов
+
+Хранение:
+- SQLite-файл в папке DATA_DIR (по умолчанию data)
+- Ключ — путь к файлу и хэш его содержимого (sha256):
+  изменённый файл получает новый хэш, и старый file_id не используется
+
+Все записи загружаются в память при старте,
+чтение из кэша не обращается к диску.
+
+file_id действителен только для бота, который загрузил файл.
+file_id, который Telegram не принял (is_invalid_file_id), удаляется (forget),
+и файл загружается заново.
+
+Точка входа:
+    preview_file_ids.get(path) / preview_file_ids.put(path, file_id)
+    preview_file_ids.forget(path)
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+from config import BASE_DIR, settings
+
+DATA_DIR = settings.DATA_DIR
+
+
+def file_hash(path: Path) -> str:
+    """
+    Возвращает sha256 содержимого файла.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_hashes: dict[str, tuple[int, int, str]] = {}
+
+
+def cached_file_hash(path: Path) -> str:
+    """
+    Возвращает sha256 содержимого файла.
+    Хэш пересчитывается только при изменении mtime или размера файла.
+    """
+    stat = path.stat()
+    key = str(path)
+    cached = _hashes.get(key)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    digest = file_hash(path)
+    _hashes[key] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def is_invalid_file_id(error: Exception) -> bool:
+    """
+    Ошибка Telegram из-за file_id: загружен другим ботом, удалён или устарел.
+    """
+    message = str(error).lower()
+    return "file identifier" in message or "file_reference" in message or "file reference" in message
+
+
+def _key(path: Path) -> str:
+    # путь относительно проекта: кэш переживает перенос папки бота
+    try:
+        return path.resolve().relative_to(BASE_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+
+class FileIdCache:
+    """
+    Кэш file_id, сохраняемый в SQLite.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS file_ids ("
+            "path TEXT PRIMARY KEY, content_hash TEXT NOT NULL, file_id TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self._file_ids: dict[str, tuple[str, str]] = {
+            path: (content_hash, file_id)
+            for path, content_hash, file_id in self._db.execute(
+                "SELECT path, content_hash, file_id FROM file_ids"
+            )
+        }
+
+    def get(self, path: Path, content_hash: str | None = None) -> str | None:
+        """
+        Возвращает file_id для файла или None,
+        если файл ещё не загружался или изменился.
+
+        content_hash — уже известный sha256 файла (например, из каталога фонов),
+        тогда файл не читается.
+        """
+        entry = self._file_ids.get(_key(path))
+        if entry and entry[0] == (content_hash or cached_file_hash(path)):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, path: Path, file_id: str, content_hash: str | None = None) -> None:
+        """
+        Запоминает file_id для текущего содержимого файла.
+        """
+        key = _key(path)
+        content_hash = content_hash or cached_file_hash(path)
+        if self._file_ids.get(key) == (content_hash, file_id):
+            return
+
+        with self._lock:
+            self._file_ids[key] = (content_hash, file_id)
+            self._db.execute(
+                "INSERT OR REPLACE INTO file_ids (path, content_hash, file_id) VALUES (?, ?, ?)",
+                (key, content_hash, file_id),
+            )
+            self._db.commit()
+
+    def forget(self, path: Path) -> None:
+        """
+        Удаляет file_id файла, который Telegram не принял.
+        """
+        key = _key(path)
+        with self._lock:
+            if self._file_ids.pop(key, None) is None:
+                return
+            self._db.execute("DELETE FROM file_ids WHERE path = ?", (key,))
+            self._db.commit()
+
+    def seed(self, path: Path, content_hash: str, file_id: str) -> None:
+        """
+        Добавляет file_id, известный заранее (из каталога фонов),
+        если для файла ещё нет своей записи. В базу не сохраняется.
+        """
+        self._file_ids.setdefault(_key(path), (content_hash, file_id))
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._file_ids)}
+
+
+preview_file_ids = FileIdCache(DATA_DIR / "file_ids.sqlite3")
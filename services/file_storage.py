@@ -37,3 +37,18 @@ def remove_user_dir(user_id: int):
     user_dir = OUTPUT_DIR / str(user_id)
     if user_dir.exists():
         shutil.rmtree(user_dir)
+
+
+def output_dir_size() -> int:
+    """
+    Возвращает суммарный объём файлов в папке output (в байтах).
+    """
+    total = 0
+    for path in OUTPUT_DIR.rglob("*"):
+        try:
+            if path.is_file():
+                total += path.stat().st_size
+        except FileNotFoundError:
+            # файл удалили между обходом и stat
+            continue
+    return total
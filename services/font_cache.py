@@ -0,0 +1,59 @@
+"""
+Общий кэш шрифтов для генерации открыток.
+
+Назначение:
+- Повторное использование загруженных объектов FreeTypeFont
+- Исключение повторного разбора файла шрифта с диска
+  при каждом подборе размера и для каждого стиля
+
+Кэш общий для всего процесса и ограничен по размеру (LRU).
+Ключ кэша — пара (путь к шрифту, размер).
+
+Точка входа:
+    get_font(font_path, size)
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import ImageFont
+
+# ===== SETTINGS =====
+FONT_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_path, size=size)
+
+
+def get_font(font_path: Path | str, size: int) -> ImageFont.FreeTypeFont:
+    """
+    Возвращает шрифт заданного размера из кэша.
+    При промахе загружает шрифт с диска и сохраняет в кэш.
+
+    Объект шрифта общий для всех вызывающих —
+    его нельзя изменять после получения.
+    """
+    return _load_font(str(font_path), size)
+
+
+def font_cache_stats() -> dict[str, int]:
+    """
+    Возвращает статистику кэша шрифтов:
+    попадания, промахи, текущий и максимальный размер.
+    """
+    info = _load_font.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
+
+
+def clear_font_cache() -> None:
+    """
+    Очищает кэш шрифтов и сбрасывает счётчики.
+    """
+    _load_font.cache_clear()
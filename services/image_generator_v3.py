@@ -7,6 +7,7 @@
 - Центрирование текста
 - Поддержка различных цветовых стилей
 - Сохранение результата в пользовательскую директорию
+- Кодирование в PNG / JPEG / WEBP, в том числе без записи на диск
 
 Модуль используется Telegram-ботом для генерации поздравительных открыток.
 Часть логики подбора шрифтов и работы с Pillow была разработана
@@ -20,14 +21,25 @@
 - Центрирование текстового блока по вертикали
 - Работа с RGBA (поддержка обводки текста)
 
-Точка входа для бота:
-    pic_creator(...)
+Точки входа:
+    render_card(...) — открытка в одном стиле
+    iter_pic_creator(...) — серия открыток (все или выбранные стили) по мере готовности
+    pic_creator(...) — та же серия списком
 """
 
 
+import io
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Iterator
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+from services.background_pool import get_background
 from services.file_storage import get_user_dir
+from services.font_cache import get_font
+from services.text_metrics import LineMeasurer, text_width
 
 # ===== PATHS =====
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +55,11 @@ FONT_TITLE = FONTS / "Montserrat-Bold.ttf"
 FONT_TEXT = FONTS / "Montserrat-Bold.ttf"
 
 
+# версия отрисовки: увеличивать при любом изменении внешнего вида открыток,
+# чтобы не отдавать из кэша открытки, нарисованные по-старому
+RENDERER_VERSION = 1
+
+
 # ===== STYLES =====
 STYLES = {
     "blue_bright_white": {
@@ -89,22 +106,22 @@ def wrap_text(text, draw, font, max_width):
     Разбивает текст на строки так, чтобы каждая строка
     умещалась в заданную максимальную ширину.
     Используется для основного текста открытки.
+
+    Каждое слово измеряется один раз, ширина строки
+    считается через LineMeasurer.
     """
 
     words = text.split()
-    lines, current = [], ""
+    measurer = LineMeasurer(font, words)
+    lines, start = [], 0
 
-    for word in words:
-        test = f"{current} {word}".strip()
-        w = draw.textbbox((0, 0), test, font=font)[2]
-        if w <= max_width:
-            current = test
-        else:
-            lines.append(current)
-            current = word
+    for i in range(len(words)):
+        if measurer.width(start, i + 1) > max_width:
+            lines.append(" ".join(words[start:i]))
+            start = i
 
-    if current:
-        lines.append(current)
+    if start < len(words):
+        lines.append(" ".join(words[start:]))
     return lines
 
 
@@ -120,19 +137,31 @@ def split_title_two_lines(title, draw, font, max_width):
     if len(words) <= 3:
         return [title]
 
+    measurer = LineMeasurer(font, words)
     for i in range(1, len(words)):
-        l1 = " ".join(words[:i])
-        l2 = " ".join(words[i:])
-
         if (
-            draw.textbbox((0, 0), l1, font=font)[2] <= max_width
-            and draw.textbbox((0, 0), l2, font=font)[2] <= max_width
+            measurer.width(0, i) <= max_width
+            and measurer.width(i, len(words)) <= max_width
         ):
-            return [l1, l2]
+            return [" ".join(words[:i]), " ".join(words[i:])]
 
     return [title]
 
 
+def _try_title_size(title, draw, font_path, max_width, size):
+    """
+    Проверяет, умещается ли заголовок при заданном размере шрифта.
+    Возвращает (шрифт, строки) или None.
+    """
+    font = get_font(font_path, size)
+    lines = split_title_two_lines(title, draw, font, max_width)
+
+    # если получилось 1 или 2 строки и каждая влезает — ок
+    if len(lines) <= 2 and all(text_width(font, line) <= max_width for line in lines):
+        return font, lines
+    return None
+
+
 def fit_title_font(
     title: str,
     draw: ImageDraw.ImageDraw,
@@ -145,60 +174,87 @@ def fit_title_font(
     Подбирает размер шрифта заголовка таким образом,
     чтобы текст уместился максимум в две строки
     и не выходил за пределы изображения по ширине.
+
+    Размеры перебираются с шагом 4 от start_size вниз.
+    Ширина текста монотонно растёт с размером шрифта,
+    поэтому наибольший подходящий размер ищется бинарным поиском.
     """
-    size = start_size
+    sizes = range(start_size, min_size - 1, -4)
+    lo, hi = 0, len(sizes)
+    fitted = None
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        result = _try_title_size(title, draw, font_path, max_width, sizes[mid])
+        if result:
+            fitted = result
+            hi = mid
+        else:
+            lo = mid + 1
 
-    while size >= min_size:
-        font = ImageFont.truetype(font_path, size=size)
-        lines = split_title_two_lines(title, draw, font, max_width)
+    if fitted:
+        return fitted
 
-        # если получилось 1 или 2 строки и каждая влезает — ок
-        if len(lines) <= 2:
-            fits = True
-            for line in lines:
-                w = draw.textbbox((0, 0), line, font=font)[2]
-                if w > max_width:
-                    fits = False
-                    break
+    # fallback
+    font = get_font(font_path, min_size)
+    return font, [title]
 
-            if fits:
-                return font, lines
 
-        size -= 4  # уменьшаем шрифт
+# ===== TIMING =====
+class PhaseTimer:
+    """
+    Накопитель длительности этапов генерации
+    (decode, fit, wrap, masks, draw, encode, save).
+    Используется бенчмарком и метриками.
+    """
 
-    # fallback
-    font = ImageFont.truetype(font_path, size=min_size)
-    return font, [title]
+    def __init__(self):
+        self.phases: dict[str, float] = {}
 
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
 
-# ===== MAIN GENERATOR =====
-def generate_card(
-    user_id: int,
-    background: Path,
+
+# ===== LAYOUT =====
+@dataclass(frozen=True)
+class CardLayout:
+    """
+    Разметка текста открытки, не зависящая от стиля.
+
+    Содержит подобранные шрифты и готовые позиции строк.
+    Вычисляется один раз для пары (фон, текст)
+    и используется для отрисовки всех стилей.
+    """
+    size: tuple[int, int]
+    title_font: ImageFont.FreeTypeFont
+    text_font: ImageFont.FreeTypeFont
+    title_lines: list[tuple[int, int, str]]
+    message_lines: list[tuple[int, int, str]]
+    block_height: int
+
+
+def build_layout(
+    img: Image.Image,
     title: str,
     message: str | None,
-    style_id: str = "santa_red"
-) -> Path:
+    timer: PhaseTimer | None = None,
+) -> CardLayout:
     """
-    Основная функция генерации открытки.
-
-    Параметры:
-    - user_id: идентификатор пользователя
-    - background: путь к фоновому изображению
-    - title: заголовок открытки
-    - message: основной текст (может быть None)
-    - style_id: идентификатор цветового стиля
+    Вычисляет разметку открытки для заданного фона.
 
     Функция:
-    - открывает фон
     - подбирает размеры шрифтов
-    - размещает заголовок и текст
-    - сохраняет результат в пользовательскую директорию
+    - переносит основной текст по строкам
+    - центрирует текстовый блок по вертикали и строки по горизонтали
 
-    Возвращает путь к сохранённому изображению.
+    Изображение используется только для измерений и не изменяется.
     """
-
-    img = Image.open(background).convert("RGBA")
+    timer = timer or PhaseTimer()
     w, h = img.size
     draw = ImageDraw.Draw(img)
     if w < h:
@@ -206,18 +262,20 @@ def generate_card(
     else:
         max_width = int(w * 0.55)
 
-    title_font, title_lines = fit_title_font(
-        title=title,
-        draw=draw,
-        font_path=FONT_TITLE,
-        max_width=max_width,
-        start_size=int(h * 0.14),
-    )
+    with timer.phase("fit"):
+        title_font, title_lines = fit_title_font(
+            title=title,
+            draw=draw,
+            font_path=FONT_TITLE,
+            max_width=max_width,
+            start_size=int(h * 0.14),
+        )
 
     text_font_size = int(title_font.size * 0.7)
-    text_font = ImageFont.truetype(FONT_TEXT, size=text_font_size)
+    text_font = get_font(FONT_TEXT, text_font_size)
 
-    message_lines = wrap_text(message, draw, text_font, max_width) if message else []
+    with timer.phase("wrap"):
+        message_lines = wrap_text(message, draw, text_font, max_width) if message else []
 
     title_height = len(title_lines) * (title_font.size + 10)
     message_height = len(message_lines) * (text_font.size + 6)
@@ -225,61 +283,334 @@ def generate_card(
 
     y = int((h - block_height) / 2)
 
+    title_positions = []
+    for line in title_lines:
+        tw = draw.textbbox((0, 0), line, font=title_font)[2]
+        title_positions.append(((w - tw) // 2, y, line))
+        y += title_font.size + 10
+
+    y += 20
+
+    message_positions = []
+    for line in message_lines:
+        tw = draw.textbbox((0, 0), line, font=text_font)[2]
+        message_positions.append(((w - tw) // 2, y, line))
+        y += text_font.size + 6
+
+    return CardLayout(
+        size=(w, h),
+        title_font=title_font,
+        text_font=text_font,
+        title_lines=title_positions,
+        message_lines=message_positions,
+        block_height=block_height,
+    )
+
+
+def draw_card(img: Image.Image, layout: CardLayout, style_id: str) -> Image.Image:
+    """
+    Рисует текст по готовой разметке в заданном стиле.
+    Изменяет переданное изображение и возвращает его.
+    """
+    draw = ImageDraw.Draw(img)
     style = STYLES[style_id]
 
     # --- DRAW TITLE ---
-    for line in title_lines:
-        tw = draw.textbbox((0, 0), line, font=title_font)[2]
-        x = (w - tw) // 2
+    for x, y, line in layout.title_lines:
         draw.text(
             (x, y),
             line,
-            font=title_font,
+            font=layout.title_font,
             fill=style["fill"],
             stroke_width=style["stroke_width"],
             stroke_fill=style["stroke"],
         )
-        y += title_font.size+10
-
-    y += 20
 
     # --- DRAW MESSAGE ---
-    for line in message_lines:
-        tw = draw.textbbox((0, 0), line, font=text_font)[2]
-        x = (w - tw) // 2
+    for x, y, line in layout.message_lines:
         draw.text(
             (x, y),
             line,
-            font=text_font,
+            font=layout.text_font,
             fill=style["fill"],
             stroke_width=max(1, style["stroke_width"] - 2)+1,
             stroke_fill=style["stroke"],
         )
-        y += text_font.size + 6
-    user_dir = get_user_dir(user_id)
-    output_path = user_dir / f"{background.stem}_{style_id}.png"
-    img.save(output_path)
+    return img
+
+
+# ===== TEXT MASKS =====
+@dataclass(frozen=True)
+class LineMask:
+    """
+    Маски покрытия одной строки текста:
+    обводка (stroke) и заливка (fill), обрезанные по области (x, y).
+    """
+    x: int
+    y: int
+    stroke: np.ndarray
+    fill: np.ndarray
+
+
+def _line_mask(x, y, line, font, stroke_width) -> LineMask | None:
+    # рисуем строку на холсте размером с её область, а не со всю открытку
+    left, top, right, bottom = font.getbbox(line, "L", stroke_width=stroke_width)
+    if right <= left or bottom <= top:
+        return None
+    size = (right - left, bottom - top)
+    origin = (-left, -top)
+
+    stroke = Image.new("L", size)
+    ImageDraw.Draw(stroke).text(
+        origin, line, font=font, fill=255, stroke_width=stroke_width, stroke_fill=255
+    )
+    fill = Image.new("L", size)
+    ImageDraw.Draw(fill).text(origin, line, font=font, fill=255)
+
+    # маски храним с осью канала, чтобы умножать на RGBA без reshape
+    return LineMask(
+        x=x + left,
+        y=y + top,
+        stroke=np.asarray(stroke, dtype=np.uint32)[..., None],
+        fill=np.asarray(fill, dtype=np.uint32)[..., None],
+    )
+
+
+def build_text_masks(layout: CardLayout, stroke_width: int) -> list[LineMask]:
+    """
+    Растеризует маски всех строк открытки для заданной толщины обводки.
+    Маски не зависят от цветов стиля и переиспользуются
+    всеми стилями с той же толщиной обводки.
+    """
+    masks = []
+    message_stroke = max(1, stroke_width - 2)+1
+    for x, y, line in layout.title_lines:
+        masks.append(_line_mask(x, y, line, layout.title_font, stroke_width))
+    for x, y, line in layout.message_lines:
+        masks.append(_line_mask(x, y, line, layout.text_font, message_stroke))
+    return [mask for mask in masks if mask is not None]
+
+
+def _blend(region: np.ndarray, mask: np.ndarray, color: tuple) -> np.ndarray:
+    # то же целочисленное смешивание, что и в Pillow при отрисовке текста:
+    # out = (in * (255 - m) + ink * m) / 255 с округлением
+    tmp = region * (255 - mask) + np.array(color, dtype=np.uint32) * mask + 128
+    return ((tmp >> 8) + tmp) >> 8
+
+
+def colorize_card(img: Image.Image, masks: list[LineMask], style_id: str) -> Image.Image:
+    """
+    Накладывает готовые маски текста на фон в цветах стиля.
+    Результат совпадает с draw_card для той же толщины обводки.
+    """
+    style = STYLES[style_id]
+    out = np.array(img)
+
+    # строки накладываются по очереди: обводка, затем заливка, как в draw.text
+    height, width = out.shape[:2]
+    for mask in masks:
+        h, w = mask.stroke.shape[:2]
+        # длинный текст может выходить за края изображения — обрезаем
+        x0, y0 = max(mask.x, 0), max(mask.y, 0)
+        x1, y1 = min(mask.x + w, width), min(mask.y + h, height)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        crop = (slice(y0 - mask.y, y1 - mask.y), slice(x0 - mask.x, x1 - mask.x))
+
+        area = out[y0:y1, x0:x1]
+        region = _blend(area.astype(np.uint32), mask.stroke[crop], style["stroke"])
+        if style["fill"] != style["stroke"]:
+            region = _blend(region, mask.fill[crop], style["fill"])
+        area[...] = region
+
+    return Image.fromarray(out, "RGBA")
+
+
+# ===== OUTPUT =====
+@dataclass(frozen=True)
+class OutputFormat:
+    """
+    Параметры кодирования готовой открытки.
+
+    - format: PNG / JPEG / WEBP
+    - quality: качество для JPEG и WEBP
+    - compress_level: степень сжатия PNG (0–9)
+    - in_memory: не сохранять файл, вернуть закодированные байты
+    """
+    format: str = "PNG"
+    quality: int = 90
+    compress_level: int = 6
+    in_memory: bool = False
+
+    @property
+    def extension(self) -> str:
+        return {"JPEG": "jpg", "WEBP": "webp"}.get(self.format.upper(), "png")
+
+
+DEFAULT_OUTPUT = OutputFormat()
+
+
+@dataclass(frozen=True)
+class RenderedCard:
+    """
+    Результат генерации одной открытки.
+
+    Содержит либо путь к файлу (path), либо байты (data),
+    а также время кодирования и размер результата.
+    Для открыток из кэша известны ключ кэша и, после первой отправки, file_id.
+    """
+    style_id: str
+    filename: str
+    path: Path | None
+    data: bytes | None
+    encode_seconds: float
+    size: int
+    file_id: str | None = None
+    cache_key: str | None = None
+
+
+def encode_card(img: Image.Image, output: OutputFormat = DEFAULT_OUTPUT) -> bytes:
+    """
+    Кодирует открытку в заданный формат.
+    Для JPEG и WEBP изображение предварительно переводится в RGB.
+    """
+    fmt = output.format.upper()
+    buffer = io.BytesIO()
+
+    if fmt == "PNG":
+        img.save(buffer, format="PNG", compress_level=output.compress_level)
+    else:
+        img.convert("RGB").save(buffer, format=fmt, quality=output.quality)
+    return buffer.getvalue()
+
+
+def save_card(
+    img: Image.Image,
+    user_id: int,
+    background: Path,
+    style_id: str,
+    output: OutputFormat = DEFAULT_OUTPUT,
+    timer: PhaseTimer | None = None,
+) -> RenderedCard:
+    """
+    Кодирует готовую открытку и, если не выбран режим in_memory,
+    сохраняет её в пользовательскую директорию.
+    """
+    timer = timer or PhaseTimer()
+    filename = f"{background.stem}_{style_id}.{output.extension}"
+
+    started = time.perf_counter()
+    with timer.phase("encode"):
+        data = encode_card(img, output)
+    encode_seconds = time.perf_counter() - started
+
+    if output.in_memory:
+        return RenderedCard(style_id, filename, None, data, encode_seconds, len(data))
+
+    with timer.phase("save"):
+        output_path = get_user_dir(user_id) / filename
+        output_path.write_bytes(data)
+    return RenderedCard(style_id, filename, output_path, None, encode_seconds, len(data))
 
-    return output_path
+
+# ===== MAIN GENERATOR =====
+def render_card(
+    user_id: int,
+    background: Path,
+    title: str,
+    message: str | None,
+    style_id: str = "santa_red",
+    output: OutputFormat = DEFAULT_OUTPUT,
+    timer: PhaseTimer | None = None,
+) -> RenderedCard:
+    """
+    Генерирует открытку в одном стиле
+    и возвращает результат вместе с параметрами кодирования.
+    """
+    return next(iter_pic_creator(background, title, message, user_id, output, timer, styles=(style_id,)))
+
+
+def generate_card(
+    user_id: int,
+    background: Path,
+    title: str,
+    message: str | None,
+    style_id: str = "santa_red"
+) -> Path:
+    """
+    Основная функция генерации открытки.
+
+    Параметры:
+    - user_id: идентификатор пользователя
+    - background: путь к фоновому изображению
+    - title: заголовок открытки
+    - message: основной текст (может быть None)
+    - style_id: идентификатор цветового стиля
+
+    Функция:
+    - берёт декодированный фон из пула
+    - вычисляет разметку (build_layout)
+    - рисует текст в заданном стиле (draw_card)
+    - сохраняет результат в пользовательскую директорию
+
+    Возвращает путь к сохранённому изображению.
+    """
+    return render_card(user_id, background, title, message, style_id).path
 
 
 # ===== LOCAL TEST =====
-def pic_creator(fon, title, message, user_id):
+def iter_pic_creator(
+    fon,
+    title,
+    message,
+    user_id,
+    output: OutputFormat = DEFAULT_OUTPUT,
+    timer: PhaseTimer | None = None,
+    styles: Iterable[str] | None = None,
+) -> Iterator[RenderedCard]:
+    """
+    Генерирует серию открыток во всех стилях STYLES
+    (или только в styles, в заданном порядке)
+    и отдаёт каждую сразу после кодирования.
+
+    Разметка вычисляется один раз, маски текста растеризуются
+    один раз на каждую толщину обводки, каждый стиль получается
+    раскраской масок поверх фона из пула.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase("decode"):
+        background = get_background(fon)
+    layout = build_layout(background, title, message, timer)
+    masks: dict[int, list[LineMask]] = {}
+
+    for stile in styles or STYLES:
+        stroke_width = STYLES[stile]["stroke_width"]
+        if stroke_width not in masks:
+            with timer.phase("masks"):
+                masks[stroke_width] = build_text_masks(layout, stroke_width)
+        with timer.phase("draw"):
+            img = colorize_card(background, masks[stroke_width], stile)
+        yield save_card(img, user_id, fon, stile, output, timer)
+
+
+def pic_creator(
+    fon,
+    title,
+    message,
+    user_id,
+    output: OutputFormat = DEFAULT_OUTPUT,
+    timer: PhaseTimer | None = None,
+):
     """
     Вспомогательная функция-обёртка.
 
-    Используется ботом для генерации серии открыток
-    в разных стилях на основе одного фона и текста.
+    Используется инструментами (бенчмарк, предгенерация кэша)
+    для генерации серии открыток в разных стилях на основе одного фона и текста.
+
+    Возвращает список RenderedCard в порядке STYLES.
     """
+    return list(iter_pic_creator(fon, title, message, user_id, output, timer))
 
-    for stile in STYLES:
-            generate_card(
-                user_id=user_id,
-                background=fon,
-                title=title,
-                message=message,
-                style_id=stile)
-    return
 
 '''"black": {
         "fill": (20, 20, 20, 255),
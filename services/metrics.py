@@ -0,0 +1,208 @@
+"""
+Метрики процесса бота в формате Prometheus.
+
+Назначение:
+- Гистограммы задержек: хендлеры, очередь генерации,
+  этапы генерации открыток, вызовы Telegram API
+- Гаужи текущего состояния: активные FSM-сессии,
+  генерации в работе, объём папки output
+- Счётчики событий: удалённые по TTL FSM-сессии
+- HTTP-эндпоинт /metrics на локальном порту
+
+Метрики собираются в памяти процесса без внешних зависимостей,
+сервер поднимается на aiohttp (уже есть в зависимостях aiogram).
+
+Точки входа:
+    registry.histogram(...) / registry.gauge(...) / registry.counter(...)
+    await start_metrics_server(host, port)
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """
+    Гистограмма с метками (накопительные корзины, как в Prometheus).
+    """
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # счётчики по корзинам (+Inf последней), сумма, количество
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(b), s, c) for key, (b, s, c) in self._series.items()}
+
+        for key, (buckets, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, hits in zip((*self.buckets, "+Inf"), buckets):
+                cumulative += hits
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels_text(self.labels, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Гауж: значение задаётся через set() или вычисляется функцией при сборе.
+    """
+
+    def __init__(self, name: str, help_text: str, func: Callable[[], float] | None = None):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> list[str]:
+        value = self.value
+        if self.func is not None:
+            try:
+                value = self.func()
+            except Exception:
+                logger.exception("Ошибка вычисления метрики %s", self.name)
+                return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Counter:
+    """
+    Монотонно растущий счётчик.
+    """
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+
+class Registry:
+    """
+    Набор метрик процесса.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Histogram | Gauge | Counter] = {}
+
+    def histogram(self, name: str, help_text: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics[name] = metric
+        return metric
+
+    def gauge(self, name: str, help_text: str, func: Callable[[], float] | None = None) -> Gauge:
+        metric = Gauge(name, help_text, func)
+        self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ===== METRICS =====
+HANDLER_LATENCY = registry.histogram(
+    "bot_handler_seconds", "Handler latency per handler", ("handler",)
+)
+TELEGRAM_API_LATENCY = registry.histogram(
+    "telegram_api_seconds", "Telegram Bot API call latency", ("method",)
+)
+RENDER_QUEUE_WAIT = registry.histogram(
+    "card_render_queue_wait_seconds", "Time a render job waits for a worker"
+)
+RENDER_DURATION = registry.histogram(
+    "card_render_seconds", "Render job duration in a worker", ("job",)
+)
+RENDER_PHASE = registry.histogram(
+    "card_render_phase_seconds", "Render duration per phase", ("phase",)
+)
+FSM_SESSIONS_EXPIRED = registry.counter(
+    "bot_fsm_sessions_expired_total", "FSM sessions removed after their TTL"
+)
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Запускает HTTP-сервер с эндпоинтом /metrics.
+    """
+    async def handle_metrics(request: web.Request) -> web.Response:
+        # гаужи могут обходить диск — считаем вне event loop
+        body = await asyncio.to_thread(registry.render)
+        return web.Response(text=body, content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,331 @@
+"""
+Движок генерации открыток на пуле процессов.
+
+Назначение:
+- Вынос генерации открыток (Pillow) из процесса бота
+  в отдельные рабочие процессы
+- Параллельная генерация для разных пользователей на всех ядрах
+- Ограничение очереди задач
+- Не больше одной задачи каждого пользователя в пуле одновременно:
+  следующая задача пользователя ждёт завершения предыдущей
+
+Pillow удерживает GIL на большей части отрисовки,
+поэтому генерация в потоках (asyncio.to_thread) выполняется
+фактически на одном ядре. Рабочие процессы этого ограничения не имеют.
+
+Каждый рабочий процесс держит собственные кэши шрифтов
+и декодированных фонов, которые живут между задачами.
+
+Несколько стилей одной открытки генерируются одной задачей
+(iter_pic_creator: разметка и маски текста общие), готовые открытки
+передаются из рабочего процесса по одной через очередь менеджера
+multiprocessing — вызывающий код получает их сразу после кодирования.
+
+Точки входа:
+    await render_engine.render_style(...)
+    async for card in render_engine.render_styles(...)
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.managers import SyncManager
+from pathlib import Path
+from queue import Empty
+from typing import AsyncIterator
+
+from config import image_files, settings
+from services.image_generator_v3 import OutputFormat, PhaseTimer, RenderedCard
+from services.metrics import RENDER_DURATION, RENDER_PHASE, RENDER_QUEUE_WAIT, registry
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):
+    """
+    Очередь генерации заполнена — новая задача не принята.
+    """
+
+
+def _init_worker(warm_paths: list[Path]) -> None:
+    """
+    Инициализация рабочего процесса:
+    загружает модуль генерации и прогревает фоны.
+    """
+    from services.background_pool import background_pool
+    import services.image_generator_v3  # noqa: F401
+
+    if warm_paths:
+        background_pool.warm_up(warm_paths)
+
+
+def _run_timed(fn, *args) -> tuple[object, float, float, dict[str, float]]:
+    """
+    Выполняет задачу в рабочем процессе и возвращает вместе с результатом
+    время начала (time.time), длительность и время по этапам (PhaseTimer).
+    """
+    started_at = time.time()
+    timer = PhaseTimer()
+    result = fn(*args, timer=timer)
+    return result, started_at, time.time() - started_at, timer.phases
+
+
+def _run_styles(
+    fon: Path, title: str, message: str | None, user_id: int, output: OutputFormat,
+    styles: list[str], queue, timer: PhaseTimer | None = None,
+) -> int:
+    """
+    Генерирует открытку в стилях styles и кладёт каждую в очередь
+    сразу после кодирования. В конце (в том числе при ошибке) — None.
+    """
+    from services.image_generator_v3 import iter_pic_creator
+
+    count = 0
+    try:
+        for card in iter_pic_creator(fon, title, message, user_id, output, timer, styles=styles):
+            queue.put(card)
+            count += 1
+    finally:
+        queue.put(None)
+    return count
+
+
+def _next_card(queue, job: Future) -> RenderedCard | None:
+    """
+    Следующая открытка из очереди задачи или None, когда задача закончилась
+    (включая аварийное завершение рабочего процесса без None в очереди).
+    """
+    while True:
+        try:
+            return queue.get(timeout=0.5)
+        except Empty:
+            if job.done():
+                return None
+
+
+def _run_render_card(
+    fon: Path, title: str, message: str | None, user_id: int, style_id: str, output: OutputFormat,
+    timer: PhaseTimer | None = None,
+) -> RenderedCard:
+    from services.image_generator_v3 import render_card
+
+    return render_card(
+        user_id=user_id,
+        background=fon,
+        title=title,
+        message=message,
+        style_id=style_id,
+        output=output,
+        timer=timer,
+    )
+
+
+class RenderEngine:
+    """
+    Пул рабочих процессов с ограниченной очередью задач.
+
+    Одновременно принимается не больше workers + queue_size задач,
+    остальные получают RenderQueueFull.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_size: int,
+        warm_paths: list[Path] | None = None,
+        output: OutputFormat | None = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.warm_paths = warm_paths or []
+        self.output = output or OutputFormat()
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._manager: SyncManager | None = None
+        # потоки, ожидающие открытки из очередей задач: не занимают
+        # общий пул asyncio.to_thread, в работе не больше capacity задач
+        self._readers = ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix="render-stream")
+        # блокировка пользователя и число задач, которые её держат или ждут
+        self._user_locks: dict[int, tuple[asyncio.Lock, int]] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def queue_length(self) -> int:
+        """
+        Сколько задач ждёт свободного процесса.
+        """
+        return max(0, self.pending - self.workers)
+
+    def start(self) -> None:
+        """
+        Создаёт пул процессов. Вызывается при старте бота,
+        а также автоматически при первой задаче.
+        """
+        if self._executor is not None:
+            return
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.warm_paths,),
+        )
+        self._manager = context.Manager()
+        logger.info("Пул генерации запущен | процессов=%s | очередь=%s", self.workers, self.queue_size)
+
+    def shutdown(self) -> None:
+        """
+        Останавливает пул, дожидаясь завершения начатых задач.
+        """
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._manager.shutdown()
+        self._manager = None
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Ждёт завершения всех задач в пуле (в работе и в очереди).
+        False — не дождались за timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        return not self.pending
+
+    async def render_style(
+        self, fon: Path, title: str, message: str | None, user_id: int, style_id: str
+    ) -> RenderedCard:
+        """
+        Генерирует открытку в одном стиле в рабочем процессе.
+        """
+        card = await self._submit(
+            user_id, _run_render_card, fon, title, message, user_id, style_id, self.output
+        )
+        self._log_card(user_id, card)
+        return card
+
+    async def render_styles(
+        self, fon: Path, title: str, message: str | None, user_id: int, styles: list[str]
+    ) -> AsyncIterator[RenderedCard]:
+        """
+        Генерирует открытку в стилях styles одной задачей пула
+        и отдаёт каждую сразу после готовности, в порядке styles.
+
+        Исключения — как у render_style; ошибка генерации пробрасывается
+        после открыток, готовых до неё.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        # очередь живёт в процессе менеджера: создание — запрос к нему, не на event loop
+        queue = await loop.run_in_executor(self._readers, self._manager.Queue)
+        job, submitted_at = await self._enqueue(
+            user_id, _run_styles, fon, title, message, user_id, self.output, styles, queue
+        )
+        while (card := await loop.run_in_executor(self._readers, _next_card, queue, job)) is not None:
+            self._log_card(user_id, card)
+            yield card
+        await self._collect(job, _run_styles, submitted_at)
+
+    def _log_card(self, user_id: int, card: RenderedCard) -> None:
+        logger.info(
+            "Открытка закодирована | пользователь=%s | стиль=%s | формат=%s | размер=%s КБ | кодирование=%.0f мс",
+            user_id,
+            card.style_id,
+            self.output.format,
+            card.size // 1024,
+            card.encode_seconds * 1000
+        )
+
+    async def _submit(self, user_id: int, fn, *args):
+        job, submitted_at = await self._enqueue(user_id, fn, *args)
+        return await self._collect(job, fn, submitted_at)
+
+    async def _enqueue(self, user_id: int, fn, *args) -> tuple[Future, float]:
+        """
+        Отправляет задачу в пул, дождавшись завершения предыдущей задачи пользователя.
+        """
+        if self.pending >= self.capacity:
+            raise RenderQueueFull(f"Очередь генерации заполнена ({self.capacity})")
+
+        self.start()
+        loop = asyncio.get_running_loop()
+
+        # одна задача пользователя в пуле: повторные клики и отменённые
+        # сессии не занимают процессы параллельно
+        lock, users = self._user_locks.get(user_id, (asyncio.Lock(), 0))
+        self._user_locks[user_id] = (lock, users + 1)
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget(user_id)
+            raise
+        # пока задача ждала предыдущую задачу пользователя, пул мог заполниться
+        if self.pending >= self.capacity:
+            self._release(user_id, lock)
+            raise RenderQueueFull(f"Очередь генерации заполнена ({self.capacity})")
+        submitted_at = time.time()
+        try:
+            job = self._executor.submit(_run_timed, fn, *args)
+        except BaseException:
+            self._release(user_id, lock)
+            raise
+        self.pending += 1
+        # место в пуле и блокировка освобождаются, когда процесс реально
+        # закончил задачу, даже если ожидающий её код уже отменён
+        job.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._finish, user_id, lock)
+        )
+        return job, submitted_at
+
+    async def _collect(self, job: Future, fn, submitted_at: float):
+        """
+        Ожидает результат задачи и записывает метрики.
+        """
+        result, started_at, duration, phases = await asyncio.wrap_future(job)
+
+        RENDER_QUEUE_WAIT.observe(max(0.0, started_at - submitted_at))
+        RENDER_DURATION.observe(duration, job=fn.__name__.removeprefix("_run_"))
+        for phase, seconds in phases.items():
+            RENDER_PHASE.observe(seconds, phase=phase)
+        return result
+
+    def _finish(self, user_id: int, lock: asyncio.Lock) -> None:
+        self.pending -= 1
+        self._release(user_id, lock)
+
+    def _release(self, user_id: int, lock: asyncio.Lock) -> None:
+        lock.release()
+        self._forget(user_id)
+
+    def _forget(self, user_id: int) -> None:
+        lock, users = self._user_locks[user_id]
+        if users > 1:
+            self._user_locks[user_id] = (lock, users - 1)
+        else:
+            del self._user_locks[user_id]
+
+
+render_engine = RenderEngine(
+    workers=settings.RENDER_WORKERS,
+    queue_size=settings.RENDER_QUEUE_SIZE,
+    warm_paths=[image.full for image in image_files[:settings.BACKGROUND_WARMUP]],
+    output=OutputFormat(
+        format=settings.OUTPUT_FORMAT,
+        quality=settings.OUTPUT_QUALITY,
+        compress_level=settings.OUTPUT_PNG_COMPRESS_LEVEL,
+        in_memory=settings.OUTPUT_IN_MEMORY,
+    ),
+)
+
+registry.gauge(
+    "card_renders_in_flight", "Render jobs running or queued in the pool",
+    lambda: render_engine.pending,
+)
@@ -0,0 +1,213 @@
+"""
+Управление папкой output с готовыми открытками.
+
+Назначение:
+- Очистка папки пользователя без блокировки event loop
+- Удаление папок пользователей, которые ушли и не вернулись (по возрасту)
+- Общая квота на объём output с вытеснением давно не использованных папок
+- Учёт освобождённого места
+
+Очистка папки при /start и «Продолжить» — это одно переименование
+в output/.trash, само удаление идёт в потоке в фоне.
+
+Фоновый проход (start_sweeper) раз в sweep_interval секунд:
+1. удаляет остатки .trash (например, после перезапуска)
+2. удаляет папки, не изменявшиеся дольше max_age
+3. пока общий объём больше max_bytes — удаляет самые старые папки
+
+Папки пользователей с активной сессией (is_active) не трогаются.
+
+Точка входа:
+    await output_storage.clear_user_dir(user_id)
+    output_storage.start_sweeper(is_active)
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+from config import settings
+from services.file_storage import OUTPUT_DIR
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RECLAIMED_BYTES = registry.counter(
+    "bot_output_reclaimed_bytes_total", "Bytes freed in the output directory"
+)
+
+
+def _dir_usage(path: Path) -> tuple[int, float]:
+    """
+    Возвращает объём папки и время последнего изменения в ней.
+    """
+    total = 0
+    last_modified = path.stat().st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            last_modified = max(last_modified, stat.st_mtime)
+    return total, last_modified
+
+
+class OutputStorage:
+    """
+    Жизненный цикл папок output/<user_id>.
+    """
+
+    def __init__(self, output_dir: Path, max_age: float, max_bytes: int, sweep_interval: float = 600):
+        self.output_dir = output_dir
+        self.trash_dir = output_dir / ".trash"
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.reclaimed_bytes = 0
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+
+    async def clear_user_dir(self, user_id: int) -> Path:
+        """
+        Очищает папку пользователя: переносит её в корзину
+        и удаляет в фоне. Возвращает новую пустую папку.
+        """
+        user_dir = self.output_dir / str(user_id)
+        trash = self._to_trash(user_dir)
+        if trash is not None:
+            task = asyncio.create_task(asyncio.to_thread(self._remove, trash))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        user_dir.mkdir(parents=True, exist_ok=True)
+        return user_dir
+
+    async def remove_user_dir(self, user_id: int) -> int:
+        """
+        Удаляет папку пользователя в потоке. Возвращает освобождённые байты.
+        """
+        return await asyncio.to_thread(self._remove, self.output_dir / str(user_id))
+
+    def start_sweeper(self, is_active: Callable[[int], bool] = lambda user_id: False) -> None:
+        """
+        Запускает фоновую очистку output.
+        is_active(user_id) — обращался ли пользователь к сессии предпросмотра недавно.
+        """
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(is_active))
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def sweep(self, is_active: Callable[[int], bool] = lambda user_id: False) -> int:
+        """
+        Один проход очистки. Возвращает освобождённые байты.
+        """
+        reclaimed = 0
+        if self.trash_dir.exists():
+            for path in list(self.trash_dir.iterdir()):
+                reclaimed += self._remove(path)
+
+        if not self.output_dir.exists():
+            self.total_bytes = 0
+            return reclaimed
+
+        now = time.time()
+        dirs = []
+        for path in list(self.output_dir.iterdir()):
+            if not path.is_dir() or path == self.trash_dir:
+                continue
+            try:
+                size, last_modified = _dir_usage(path)
+            except FileNotFoundError:
+                continue
+            user_id = int(path.name) if path.name.lstrip("-").isdigit() else None
+            if user_id is not None and is_active(user_id):
+                dirs.append((last_modified, path, size, True))
+                continue
+            if now - last_modified > self.max_age:
+                reclaimed += self._remove(path)
+                continue
+            dirs.append((last_modified, path, size, False))
+
+        total = sum(size for _, _, size, _ in dirs)
+        # квота: сначала самые давно не изменявшиеся папки
+        for _, path, size, active in sorted(dirs, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if active:
+                continue
+            reclaimed += self._remove(path)
+            total -= size
+
+        self.total_bytes = total
+        return reclaimed
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "reclaimed_bytes": self.reclaimed_bytes,
+        }
+
+    async def _sweep_loop(self, is_active: Callable[[int], bool]) -> None:
+        while True:
+            try:
+                reclaimed = await asyncio.to_thread(self.sweep, is_active)
+            except Exception:
+                logger.exception("Ошибка очистки папки output")
+            else:
+                if reclaimed:
+                    logger.info(
+                        "Очистка output | освобождено=%s КБ | занято=%s КБ",
+                        reclaimed // 1024,
+                        self.total_bytes // 1024,
+                    )
+            await asyncio.sleep(self.sweep_interval)
+
+    def _to_trash(self, path: Path) -> Path | None:
+        if not path.exists():
+            return None
+        self.trash_dir.mkdir(parents=True, exist_ok=True)
+        trash = self.trash_dir / f"{path.name}-{uuid.uuid4().hex}"
+        os.replace(path, trash)
+        return trash
+
+    def _remove(self, path: Path) -> int:
+        """
+        Удаляет файл или папку, учитывает освобождённые байты.
+        """
+        try:
+            size = _dir_usage(path)[0] if path.is_dir() else path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+        with self._lock:
+            self.reclaimed_bytes += size
+        RECLAIMED_BYTES.inc(size)
+        return size
+
+
+output_storage = OutputStorage(
+    OUTPUT_DIR,
+    max_age=settings.OUTPUT_MAX_AGE_HOURS * 3600,
+    max_bytes=settings.OUTPUT_QUOTA_MB * 1024 * 1024,
+    sweep_interval=settings.OUTPUT_SWEEP_SECONDS,
+)
@@ -0,0 +1,93 @@
+"""
+Измерение текста для подбора шрифтов открыток.
+
+Назначение:
+- Мемоизация измерений строк и отдельных слов
+- Быстрое вычисление ширины строки из слов через префиксные суммы
+
+При базовой раскладке FreeType (без libraqm) ширина строки из слов
+складывается точно: сумма ширин слов и пробелов плюс выступ глифов
+последнего слова за его ширину. Поэтому каждое слово измеряется
+один раз для шрифта, а проверка строки — это арифметика.
+
+При сложной раскладке (libraqm) сумма не гарантируется,
+и строки измеряются целиком (с мемоизацией).
+
+Точки входа:
+    text_width(font, text)
+    LineMeasurer(font, words)
+"""
+
+from functools import lru_cache
+from itertools import accumulate
+
+from PIL import ImageFont
+
+# ===== SETTINGS =====
+MEASURE_CACHE_SIZE = 8192
+FONT_MODE = "L"
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def text_width(font: ImageFont.FreeTypeFont, text: str) -> int:
+    """
+    Возвращает правую границу текста так же,
+    как draw.textbbox((0, 0), text, font=font)[2].
+    """
+    # многострочный текст textbbox измеряет построчно
+    return max(font.getbbox(line, FONT_MODE)[2] for line in text.split("\n"))
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def _word_metrics(font: ImageFont.FreeTypeFont, word: str) -> tuple[float, float]:
+    """
+    Возвращает ширину слова (advance) и выступ глифов за неё.
+    """
+    advance = font.getlength(word, FONT_MODE)
+    return advance, text_width(font, word) - advance
+
+
+class LineMeasurer:
+    """
+    Измеряет строки, составленные из подряд идущих слов.
+
+    Ширина words[start:end], соединённых одним пробелом,
+    вычисляется без повторного измерения текста.
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont, words: list[str]):
+        self.font = font
+        self.words = words
+        self._additive = font.layout_engine == ImageFont.Layout.BASIC
+
+        if self._additive:
+            metrics = [_word_metrics(font, word) for word in words]
+            self._prefix = [0.0, *accumulate(m[0] for m in metrics)]
+            self._overhang = [m[1] for m in metrics]
+            self._space = _word_metrics(font, " ")[0]
+
+    def width(self, start: int, end: int) -> float:
+        """
+        Ширина строки из слов words[start:end].
+        """
+        if not self._additive:
+            return text_width(self.font, " ".join(self.words[start:end]))
+
+        return (
+            self._prefix[end] - self._prefix[start]
+            + self._space * (end - start - 1)
+            + self._overhang[end - 1]
+        )
+
+
+def measure_cache_stats() -> dict[str, int]:
+    """
+    Возвращает статистику кэшей измерений.
+    """
+    lines = text_width.cache_info()
+    words = _word_metrics.cache_info()
+    return {
+        "hits": lines.hits + words.hits,
+        "misses": lines.misses + words.misses,
+        "size": lines.currsize + words.currsize,
+    }
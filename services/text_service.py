@@ -14,10 +14,16 @@
 - Кодировка: UTF-8
 - Один текст = один абзац
 
+Тексты держатся в памяти (text_catalogue) и перечитываются
+только при изменении mtime файла, поэтому в FSM достаточно
+хранить категорию и номер текста.
+
 Точка входа:
-    load_texts(category)
+    text_catalogue.get(category) / text_catalogue.text(category, index)
+    load_texts(category) — чтение файла без кэша
 """
 
+import threading
 from pathlib import Path
 
 BASE_DIR =  Path(__file__).resolve().parents[1]
@@ -43,3 +49,42 @@ def load_texts(category: str) -> list[str]:
     # каждый текст отделён пустой строкой
     texts = [t.strip() for t in content.split("\n") if t.strip()]
     return texts
+
+
+class TextCatalogue:
+    """
+    Кэш текстов по категориям с перечитыванием изменённых файлов.
+    """
+
+    def __init__(self, texts_dir: Path = TEXTS_DIR):
+        self.texts_dir = texts_dir
+        self._texts: dict[str, tuple[int, tuple[str, ...]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, category: str) -> tuple[str, ...]:
+        """
+        Возвращает тексты категории.
+        Файл читается при первом обращении и после изменения mtime.
+        """
+        mtime_ns = (self.texts_dir / f"{category}.txt").stat().st_mtime_ns
+        cached = self._texts.get(category)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+
+        with self._lock:
+            texts = tuple(load_texts(category))
+            self._texts[category] = (mtime_ns, texts)
+        return texts
+
+    def text(self, category: str, index: int) -> str | None:
+        """
+        Возвращает текст по номеру (по кругу) или None, если категория пуста или отсутствует.
+        """
+        try:
+            texts = self.get(category)
+        except FileNotFoundError:
+            return None
+        return texts[index % len(texts)] if texts else None
+
+
+text_catalogue = TextCatalogue()
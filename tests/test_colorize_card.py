@@ -0,0 +1,38 @@
+"""
+Раскраска масок текста (colorize_card) совпадает с отрисовкой
+текста через ImageDraw (draw_card) для всех стилей на всех фонах
+из assets/previews.
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.image_generator_v3 import ASSETS, STYLES, build_layout, build_text_masks, colorize_card, draw_card
+from services.text_service import TEXTS_DIR, load_texts
+
+# допустимое расхождение канала пикселя (округление при смешивании)
+TOLERANCE = 1
+
+TITLE = "С наступающим Новым годом!"
+# самый длинный текст — больше всего строк, в том числе у краёв фона
+MESSAGE = max((text for path in TEXTS_DIR.glob("*.txt") for text in load_texts(path.stem)), key=len)
+
+PREVIEWS = sorted(path for path in (ASSETS / "previews").iterdir() if path.is_file())
+
+
+@pytest.mark.parametrize("preview", PREVIEWS, ids=[path.name for path in PREVIEWS])
+def test_matches_draw_card(preview):
+    with Image.open(preview) as src:
+        background = src.convert("RGBA")
+    layout = build_layout(background, TITLE, MESSAGE)
+
+    for style_id, style in STYLES.items():
+        masks = build_text_masks(layout, style["stroke_width"])
+        expected = np.asarray(draw_card(background.copy(), layout, style_id), dtype=np.int16)
+        actual = np.asarray(colorize_card(background, masks, style_id), dtype=np.int16)
+        assert actual.shape == expected.shape
+        assert np.abs(actual - expected).max() <= TOLERANCE, style_id
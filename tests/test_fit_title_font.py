@@ -0,0 +1,114 @@
+"""
+Подбор шрифта заголовка и перенос текста совпадают с прежней
+линейной реализацией на всех фонах из assets/previews.
+
+Прежние fit_title_font / split_title_two_lines / wrap_text
+(перебор размеров по одному и измерение каждой строки через textbbox)
+заморожены ниже как эталон.
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from services.font_cache import get_font
+from services.image_generator_v3 import ASSETS, FONT_TEXT, FONT_TITLE, fit_title_font, wrap_text
+from services.text_service import TEXTS_DIR, load_texts
+
+TITLES = (
+    "С наступающим Новым годом!",
+    "С Новым годом!",
+    "С Рождеством!",
+    "Со Старым Новым годом!",
+    "С Новым годом и Рождеством, дорогие друзья и коллеги!",
+    "Поздравляю",
+    "Счастья, здоровья, любви и исполнения всех желаний в новом году",
+)
+
+MESSAGES = [text for path in sorted(TEXTS_DIR.glob("*.txt")) for text in load_texts(path.stem)]
+
+PREVIEWS = sorted(path for path in (ASSETS / "previews").iterdir() if path.is_file())
+
+
+# ===== FROZEN REFERENCE =====
+def old_wrap_text(text, draw, font, max_width):
+    words = text.split()
+    lines, current = [], ""
+
+    for word in words:
+        test = f"{current} {word}".strip()
+        w = draw.textbbox((0, 0), test, font=font)[2]
+        if w <= max_width:
+            current = test
+        else:
+            lines.append(current)
+            current = word
+
+    if current:
+        lines.append(current)
+    return lines
+
+
+def old_split_title_two_lines(title, draw, font, max_width):
+    words = title.split()
+    if len(words) <= 3:
+        return [title]
+
+    for i in range(1, len(words)):
+        l1 = " ".join(words[:i])
+        l2 = " ".join(words[i:])
+
+        if (
+            draw.textbbox((0, 0), l1, font=font)[2] <= max_width
+            and draw.textbbox((0, 0), l2, font=font)[2] <= max_width
+        ):
+            return [l1, l2]
+
+    return [title]
+
+
+def old_fit_title_font(title, draw, font_path, max_width, start_size, min_size=40):
+    size = start_size
+
+    while size >= min_size:
+        font = get_font(font_path, size)
+        lines = old_split_title_two_lines(title, draw, font, max_width)
+
+        if len(lines) <= 2:
+            fits = True
+            for line in lines:
+                w = draw.textbbox((0, 0), line, font=font)[2]
+                if w > max_width:
+                    fits = False
+                    break
+
+            if fits:
+                return font, lines
+
+        size -= 4
+
+    font = get_font(font_path, min_size)
+    return font, [title]
+
+
+# ===== TESTS =====
+@pytest.mark.parametrize("preview", PREVIEWS, ids=[path.name for path in PREVIEWS])
+def test_matches_linear_implementation(preview):
+    with Image.open(preview) as img:
+        w, h = img.size
+    # измерения не зависят от содержимого фона, только от его размеров
+    draw = ImageDraw.Draw(Image.new("RGB", (w, h)))
+    max_width = int(w * 0.8) if w < h else int(w * 0.55)
+
+    for title in TITLES:
+        font, lines = fit_title_font(title, draw, FONT_TITLE, max_width, start_size=int(h * 0.14))
+        old_font, old_lines = old_fit_title_font(title, draw, FONT_TITLE, max_width, start_size=int(h * 0.14))
+        assert (font.size, lines) == (old_font.size, old_lines), title
+
+        text_font = get_font(FONT_TEXT, int(font.size * 0.7))
+        for message in MESSAGES:
+            assert wrap_text(message, draw, text_font, max_width) == old_wrap_text(
+                message, draw, text_font, max_width
+            ), message
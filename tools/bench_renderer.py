@@ -0,0 +1,215 @@
+"""
+Бенчмарк генерации открыток (services/image_generator_v3).
+
+Назначение:
+- Замер скорости generate_card / render_card и pic_creator
+  на всех фонах из assets/previews
+- Короткие, средние и длинные тексты из texts/
+- Время по этапам: decode, fit, wrap, masks, draw, encode, save
+- p50 / p95 задержки и пиковая память процесса
+- Сравнение с сохранённым базовым прогоном
+
+Модуль НЕ используется напрямую в Telegram-боте.
+Запускается отдельно из корня проекта:
+    python -m tools.bench_renderer --out bench.json
+    python -m tools.bench_renderer --baseline bench.json --threshold 0.15
+
+Если p50 или p95 какого-либо сценария выросли относительно базового
+прогона больше чем на threshold, скрипт завершается с кодом 1.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from services.background_pool import background_pool
+from services.file_storage import remove_user_dir
+from services.font_cache import clear_font_cache
+from services.image_generator_v3 import (
+    ASSETS,
+    STYLES,
+    OutputFormat,
+    PhaseTimer,
+    pic_creator,
+    render_card,
+)
+from services.text_service import TEXTS_DIR
+
+# ===== SETTINGS =====
+PREVIEWS_DIR = ASSETS / "previews"
+ALLOWED_EXT = (".jpg", ".jpeg", ".png")
+BENCH_USER_ID = 0
+
+# заголовки как у поводов в боте + длинный, который переносится на две строки
+TITLES = {
+    "short": "С Рождеством!",
+    "medium": "Со Старым Новым годом!",
+    "long": "С наступающим Новым годом и Рождеством, дорогие друзья!",
+}
+
+
+def pick_messages() -> dict[str, str]:
+    """
+    Выбирает самый короткий, медианный и самый длинный текст из texts/.
+    """
+    texts = sorted(
+        (
+            line.strip()
+            for path in sorted(TEXTS_DIR.glob("*.txt"))
+            for line in path.read_text(encoding="utf-8").split("\n")
+            if line.strip()
+        ),
+        key=len,
+    )
+    return {"short": texts[0], "medium": texts[len(texts) // 2], "long": texts[-1]}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], phases: list[dict[str, float]]) -> dict:
+    names = sorted({name for run in phases for name in run})
+    return {
+        "runs": len(latencies),
+        "latency": {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "mean": statistics.fmean(latencies),
+        },
+        "phases": {
+            name: {
+                "p50": percentile([run.get(name, 0.0) for run in phases], 0.5),
+                "p95": percentile([run.get(name, 0.0) for run in phases], 0.95),
+                "total": sum(run.get(name, 0.0) for run in phases),
+            }
+            for name in names
+        },
+    }
+
+
+def run_scenario(name, backgrounds, title, message, output, repeat, cold):
+    """
+    Прогоняет generate_card (один стиль) и pic_creator (все стили)
+    по всем фонам и возвращает сводку по каждому.
+    """
+    results = {}
+    for mode in ("generate_card", "pic_creator"):
+        latencies, phases = [], []
+        for _ in range(repeat):
+            for background in backgrounds:
+                if cold:
+                    background_pool.clear()
+                    clear_font_cache()
+                timer = PhaseTimer()
+                started = time.perf_counter()
+                if mode == "generate_card":
+                    render_card(
+                        BENCH_USER_ID, background, title, message,
+                        next(iter(STYLES)), output, timer,
+                    )
+                else:
+                    pic_creator(background, title, message, BENCH_USER_ID, output, timer)
+                latencies.append(time.perf_counter() - started)
+                phases.append(timer.phases)
+        results[mode] = summarize(latencies, phases)
+        print(
+            f"{name:>6} | {mode:<13} | p50={results[mode]['latency']['p50'] * 1000:7.1f} ms"
+            f" | p95={results[mode]['latency']['p95'] * 1000:7.1f} ms"
+        )
+    return results
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Возвращает список регрессий относительно базового прогона.
+    """
+    regressions = []
+    for scenario, modes in current["scenarios"].items():
+        for mode, summary in modes.items():
+            base = baseline.get("scenarios", {}).get(scenario, {}).get(mode)
+            if not base:
+                continue
+            for q in ("p50", "p95"):
+                now, before = summary["latency"][q], base["latency"][q]
+                if before and now > before * (1 + threshold):
+                    regressions.append(
+                        f"{scenario}/{mode} {q}: {before * 1000:.1f} ms -> {now * 1000:.1f} ms"
+                    )
+    return regressions
+
+
+def main():
+    """
+    Точка входа бенчмарка.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the card renderer")
+    parser.add_argument("--out", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare with a saved JSON run")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N backgrounds")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--format", default="PNG", help="PNG / JPEG / WEBP")
+    parser.add_argument("--quality", type=int, default=90)
+    parser.add_argument("--cold", action="store_true", help="clear font and background caches before every run")
+    args = parser.parse_args()
+
+    backgrounds = sorted(p for p in PREVIEWS_DIR.iterdir() if p.suffix.lower() in ALLOWED_EXT)
+    if args.limit:
+        backgrounds = backgrounds[:args.limit]
+    output = OutputFormat(format=args.format, quality=args.quality)
+    messages = pick_messages()
+
+    print(f"Backgrounds: {len(backgrounds)}, format: {output.format}, cold: {args.cold}")
+    scenarios = {}
+    try:
+        for size in ("short", "medium", "long"):
+            scenarios[size] = run_scenario(
+                size, backgrounds, TITLES[size], messages[size], output, args.repeat, args.cold
+            )
+    finally:
+        remove_user_dir(BENCH_USER_ID)
+
+    result = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backgrounds": len(backgrounds),
+            "repeat": args.repeat,
+            "format": output.format,
+            "cold": args.cold,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "scenarios": scenarios,
+    }
+    print(f"Peak RSS: {result['peak_rss_mb']:.0f} MB")
+
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Saved: {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(result, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION: {line}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,8 @@ edit_media_prevent_duplicate
 
 Использование:
 Функция вызывается из callback-хендлеров.
-Возвращает True при успешном обновлении сообщения
-или False, если действие было проигнорировано (duplicate).
+Возвращает отредактированное сообщение (или True для inline-сообщений)
+при успешном обновлении или False, если действие было проигнорировано (duplicate).
 
 Модуль не реализует антиспам или rate limit —
 он мягко обрабатывает повторные вызовы Telegram API
@@ -21,7 +21,9 @@ edit_media_prevent_duplicate
 """
 
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import CallbackQuery, InputMediaPhoto
+from aiogram.types import CallbackQuery, InputMediaPhoto, Message
+
+from services.file_id_cache import is_invalid_file_id
 
 
 
@@ -30,24 +32,30 @@ async def edit_media_prevent_duplicate(
     media: InputMediaPhoto,
     reply_markup=None,
     alert_text: str = "Пожалуйста, подождите 🙂\nИзображение обновляется."
-) -> bool:
+) -> Message | bool:
     """
     Безопасно редактирует media в сообщении.
     Предотвращает ошибку Telegram при повторных / быстрых кликах
     и показывает пользователю alert вместо падения бота.
 
-    :return: True — если edit_media выполнен
+    :return: Message / True — если edit_media выполнен
              False — если произошёл duplicate / not modified
+
+    Ошибка из-за file_id (is_invalid_file_id) пробрасывается:
+    вызывающий код отправляет файл заново.
     """
     try:
-        await call.message.edit_media(
+        result = await call.message.edit_media(
             media=media,
             reply_markup=reply_markup
         )
         await call.answer()
-        return True
+        # для inline-сообщений Telegram возвращает True вместо сообщения
+        return result if isinstance(result, Message) else True
 
-    except TelegramBadRequest:
+    except TelegramBadRequest as e:
+        if is_invalid_file_id(e):
+            raise
         # Чаще всего: message is not modified (двойной клик)
         await call.answer(alert_text, show_alert=True)
         return False
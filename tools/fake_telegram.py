@@ -0,0 +1,453 @@
+"""
+Локальный фейковый Telegram Bot API для нагрузочного теста.
+
+Назначение:
+- Замена api.telegram.org: бот запускается с TELEGRAM_API_URL,
+  указывающим на этот сервер
+- Доставка апдейтов через getUpdates (long polling)
+  или POST на webhook после setWebhook
+- Методы, которые вызывает бот: sendPhoto, sendMediaGroup, sendMessage, editMessageMedia,
+  editMessageText, editMessageReplyMarkup, deleteMessage, answerCallbackQuery
+- Приём загружаемых файлов (multipart читается потоком, файл не хранится)
+  и выдача фейковых file_id
+- Хранение сообщений чатов: колбэк нажимается на сообщении
+  в том виде, в каком его оставил бот
+- Очередь действий бота по каждому чату — по ней виртуальный
+  пользователь ждёт ответа на свой шаг
+- Счётчики вызовов, ошибок и загруженных байт по методам
+
+Можно задать задержку ответа и пропускную способность загрузки,
+чтобы приблизить поведение к настоящему Telegram.
+
+Модуль НЕ используется в Telegram-боте, его запускает tools.load_test.
+
+Точка входа:
+    api = FakeTelegramApi(token)
+    await api.start(host, port)
+    api.user_message(user_id, text) / api.press(user_id, message, data)
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, NamedTuple
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# размеры фейкового фото в ответах (бот их не использует)
+PHOTO_SIDE = 1280
+# сколько апдейтов отдаёт getUpdates, если limit не задан
+UPDATES_LIMIT = 100
+
+
+class ApiError(Exception):
+    """
+    Ошибка метода: уходит боту как {"ok": false, "error_code": ..., "description": ...}.
+    """
+
+    def __init__(self, code: int, description: str):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+class BotAction(NamedTuple):
+    """
+    Вызов API ботом в чате: метод, параметры и получившееся сообщение.
+    """
+    method: str
+    params: dict[str, Any]
+    message: dict | None
+
+
+@dataclass
+class MethodStats:
+    calls: int = 0
+    errors: int = 0
+    upload_bytes: int = 0
+    uploads: int = 0
+
+
+class FakeChat:
+    """
+    Личный чат пользователя с ботом.
+    """
+
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+        self.messages: dict[int, dict] = {}
+        self.actions: asyncio.Queue[BotAction] = asyncio.Queue()
+        self._message_ids = itertools.count(1)
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    def drain(self) -> None:
+        """
+        Выбрасывает действия бота, которые никто не ждёт (после ошибки шага).
+        """
+        while not self.actions.empty():
+            self.actions.get_nowait()
+
+
+class FakeTelegramApi:
+    """
+    Сервер фейкового Bot API на aiohttp.
+
+    latency — задержка каждого ответа, секунд;
+    upload_mbps — пропускная способность загрузки файлов (0 — без ограничения).
+    """
+
+    def __init__(self, token: str, latency: float = 0.0, upload_mbps: float = 0.0):
+        self.token = token
+        self.bot_id = int(token.split(":", 1)[0])
+        self.latency = latency
+        self.upload_mbps = upload_mbps
+        self.stats: dict[str, MethodStats] = {}
+        # бот запущен: вызвал getUpdates или setWebhook
+        self.ready = asyncio.Event()
+
+        self.webhook_url = ""
+        self.webhook_secret = ""
+        self._webhook_slots: asyncio.Semaphore | None = None
+        self._client: aiohttp.ClientSession | None = None
+
+        self._chats: dict[int, FakeChat] = {}
+        self._callbacks: dict[str, int] = {}
+        self._updates: deque[dict] = deque()
+        self._has_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        # выданные file_id: чужой file_id отклоняется, как в Telegram
+        self._issued: set[str] = set()
+        self._runner: web.AppRunner | None = None
+
+        self._methods = {
+            "getMe": self._get_me,
+            "getUpdates": self._get_updates,
+            "setWebhook": self._set_webhook,
+            "deleteWebhook": self._delete_webhook,
+            "sendMessage": self._send_message,
+            "sendPhoto": self._send_photo,
+            "sendMediaGroup": self._send_media_group,
+            "editMessageMedia": self._edit_message_media,
+            "editMessageText": self._edit_message_text,
+            "editMessageReplyMarkup": self._edit_message_reply_markup,
+            "deleteMessage": self._delete_message,
+            "answerCallbackQuery": self._answer_callback_query,
+            "close": self._ok,
+        }
+
+    # ===== SERVER =====
+    async def start(self, host: str, port: int) -> None:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, handle_signals=False, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._client = aiohttp.ClientSession()
+        logger.info("Фейковый Bot API слушает http://%s:%s", host, port)
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        stats = self.stats.setdefault(method, MethodStats())
+        stats.calls += 1
+        started = time.perf_counter()
+        uploads: dict[str, int] = {}
+        try:
+            if request.match_info["token"] != self.token:
+                raise ApiError(401, "Unauthorized")
+            handler = self._methods.get(method)
+            if handler is None:
+                raise ApiError(404, "Not Found: method not found")
+            params, uploads = await self._read_params(request)
+            stats.uploads += len(uploads)
+            stats.upload_bytes += sum(uploads.values())
+            result = await handler(params, uploads)
+            payload, status = {"ok": True, "result": result}, 200
+        except ApiError as error:
+            stats.errors += 1
+            payload, status = {"ok": False, "error_code": error.code, "description": error.description}, error.code
+        except Exception as error:
+            logger.exception("Ошибка фейкового API | метод=%s", method)
+            stats.errors += 1
+            payload, status = {"ok": False, "error_code": 500, "description": str(error)}, 500
+
+        delay = self.latency
+        if self.upload_mbps:
+            delay += sum(uploads.values()) * 8 / (self.upload_mbps * 1_000_000)
+        delay -= time.perf_counter() - started
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return web.json_response(payload, status=status)
+
+    async def _read_params(self, request: web.Request) -> tuple[dict[str, Any], dict[str, int]]:
+        """
+        Параметры запроса и загруженные файлы (имя поля -> размер в байтах).
+        aiogram отправляет multipart: поля — строки (сложные — JSON), файлы — отдельные части.
+        """
+        params: dict[str, Any] = {}
+        uploads: dict[str, int] = {}
+        if request.content_type == "multipart/form-data":
+            reader = await request.multipart()
+            while (part := await reader.next()) is not None:
+                if part.filename:
+                    size = 0
+                    while chunk := await part.read_chunk():
+                        size += len(chunk)
+                    uploads[part.name] = size
+                else:
+                    params[part.name] = await part.text()
+        elif request.content_type == "application/json":
+            params = await request.json()
+        elif request.can_read_body:
+            params = dict(await request.post())
+        return params, uploads
+
+    # ===== UPDATES =====
+    def chat(self, chat_id: int) -> FakeChat:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = FakeChat(chat_id)
+        return chat
+
+    async def user_message(self, user_id: int, text: str) -> None:
+        """
+        Пользователь отправляет боту текстовое сообщение.
+        """
+        chat = self.chat(user_id)
+        message = {
+            "message_id": chat.next_message_id(),
+            "date": int(time.time()),
+            "chat": self._chat_json(user_id),
+            "from": self._user_json(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        chat.messages[message["message_id"]] = message
+        await self._deliver({"message": message})
+
+    async def press(self, user_id: int, message: dict, data: str) -> str:
+        """
+        Пользователь нажимает inline-кнопку с callback_data=data на сообщении бота.
+        Возвращает id колбэка.
+        """
+        self.chat(user_id)
+        callback_id = str(next(self._callback_ids))
+        self._callbacks[callback_id] = user_id
+        await self._deliver({
+            "callback_query": {
+                "id": callback_id,
+                "from": self._user_json(user_id),
+                "chat_instance": str(user_id),
+                "message": message,
+                "data": data,
+            }
+        })
+        return callback_id
+
+    async def _deliver(self, update: dict) -> None:
+        update["update_id"] = next(self._update_ids)
+        if not self.webhook_url:
+            self._updates.append(update)
+            self._has_updates.set()
+            return
+
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        async with self._webhook_slots:
+            async with self._client.post(self.webhook_url, json=update, headers=headers) as response:
+                if response.status != 200:
+                    raise ApiError(response.status, f"webhook ответил {response.status}")
+
+    # ===== METHODS =====
+    async def _ok(self, params, uploads) -> bool:
+        return True
+
+    async def _get_me(self, params, uploads) -> dict:
+        return {**self._bot_json(), "can_join_groups": False, "can_read_all_group_messages": False,
+                "supports_inline_queries": False}
+
+    async def _get_updates(self, params, uploads) -> list[dict]:
+        if self.webhook_url:
+            raise ApiError(409, "Conflict: can't use getUpdates method while webhook is active")
+        self.ready.set()
+        offset = int(params.get("offset") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                return []
+        limit = int(params.get("limit") or UPDATES_LIMIT)
+        return list(itertools.islice(self._updates, limit))
+
+    async def _set_webhook(self, params, uploads) -> bool:
+        self.webhook_url = params["url"]
+        self.webhook_secret = params.get("secret_token", "")
+        self._webhook_slots = asyncio.Semaphore(int(params.get("max_connections") or 40))
+        self.ready.set()
+        return True
+
+    async def _delete_webhook(self, params, uploads) -> bool:
+        self.webhook_url = ""
+        return True
+
+    async def _send_message(self, params, uploads) -> dict:
+        chat = self._chat_param(params)
+        message = self._new_message(chat, text=params["text"])
+        self._set_markup(message, params)
+        return self._record(chat, "sendMessage", params, message)
+
+    async def _send_photo(self, params, uploads) -> dict:
+        chat = self._chat_param(params)
+        message = self._new_message(chat, photo=self._photo(params["photo"], uploads))
+        if params.get("caption"):
+            message["caption"] = params["caption"]
+        self._set_markup(message, params)
+        return self._record(chat, "sendPhoto", params, message)
+
+    async def _send_media_group(self, params, uploads) -> list[dict]:
+        chat = self._chat_param(params)
+        media = json.loads(params["media"])
+        if not 2 <= len(media) <= 10:
+            raise ApiError(400, "Bad Request: wrong number of media in the album")
+        group_id = str(next(self._file_ids))
+        messages = []
+        for item in media:
+            message = self._new_message(chat, photo=self._photo(item["media"], uploads), media_group_id=group_id)
+            if item.get("caption"):
+                message["caption"] = item["caption"]
+            messages.append(message)
+        self._record(chat, "sendMediaGroup", params, None)
+        return messages
+
+    async def _edit_message_media(self, params, uploads) -> dict:
+        chat, message = self._message_param(params)
+        media = json.loads(params["media"])
+        message.pop("caption", None)
+        message["photo"] = self._photo(media["media"], uploads)
+        if media.get("caption"):
+            message["caption"] = media["caption"]
+        self._set_markup(message, params)
+        return self._record(chat, "editMessageMedia", params, message)
+
+    async def _edit_message_text(self, params, uploads) -> dict:
+        chat, message = self._message_param(params)
+        if "text" not in message:
+            raise ApiError(400, "Bad Request: there is no text in the message to edit")
+        message["text"] = params["text"]
+        self._set_markup(message, params)
+        return self._record(chat, "editMessageText", params, message)
+
+    async def _edit_message_reply_markup(self, params, uploads) -> dict:
+        chat, message = self._message_param(params)
+        self._set_markup(message, params)
+        return self._record(chat, "editMessageReplyMarkup", params, message)
+
+    async def _delete_message(self, params, uploads) -> bool:
+        chat = self._chat_param(params)
+        if chat.messages.pop(int(params["message_id"]), None) is None:
+            raise ApiError(400, "Bad Request: message to delete not found")
+        self._record(chat, "deleteMessage", params, None)
+        return True
+
+    async def _answer_callback_query(self, params, uploads) -> bool:
+        user_id = self._callbacks.pop(params["callback_query_id"], None)
+        if user_id is None:
+            raise ApiError(400, "Bad Request: query is too old and response timeout expired or query ID is invalid")
+        params["show_alert"] = params.get("show_alert") in ("true", "True", True)
+        self._record(self.chat(user_id), "answerCallbackQuery", params, None)
+        return True
+
+    # ===== HELPERS =====
+    def _chat_param(self, params) -> FakeChat:
+        chat_id = int(params["chat_id"])
+        if chat_id not in self._chats:
+            raise ApiError(400, "Bad Request: chat not found")
+        return self._chats[chat_id]
+
+    def _message_param(self, params) -> tuple[FakeChat, dict]:
+        chat = self._chat_param(params)
+        message = chat.messages.get(int(params["message_id"]))
+        if message is None:
+            raise ApiError(400, "Bad Request: message to edit not found")
+        return chat, message
+
+    def _new_message(self, chat: FakeChat, **fields) -> dict:
+        message = {
+            "message_id": chat.next_message_id(),
+            "date": int(time.time()),
+            "chat": self._chat_json(chat.id),
+            "from": self._bot_json(),
+            **fields,
+        }
+        chat.messages[message["message_id"]] = message
+        return message
+
+    def _photo(self, media: str, uploads: dict[str, int]) -> list[dict]:
+        """
+        Фото из загруженного файла (attach://<поле>) получает новый file_id,
+        строка без attach:// — уже выданный file_id, используется как есть,
+        невыданный отклоняется.
+        """
+        size = 0
+        if media.startswith("attach://"):
+            field = media.removeprefix("attach://")
+            if field not in uploads:
+                raise ApiError(400, f"Bad Request: file {field} not found in request")
+            size = uploads[field]
+            media = f"fake-photo-{next(self._file_ids)}"
+            self._issued.add(media)
+        elif media not in self._issued:
+            raise ApiError(400, "Bad Request: wrong file identifier/HTTP URL specified")
+        return [{
+            "file_id": media,
+            "file_unique_id": media.rsplit("-", 1)[-1],
+            "width": PHOTO_SIDE,
+            "height": PHOTO_SIDE,
+            "file_size": size,
+        }]
+
+    @staticmethod
+    def _set_markup(message: dict, params) -> None:
+        # как в Telegram: сообщение, отредактированное без reply_markup, теряет кнопки
+        if params.get("reply_markup"):
+            message["reply_markup"] = json.loads(params["reply_markup"])
+        else:
+            message.pop("reply_markup", None)
+
+    @staticmethod
+    def _record(chat: FakeChat, method: str, params, message: dict | None) -> dict | None:
+        # копия: сообщение в чате дальше меняется, а действие — снимок на момент вызова
+        snapshot = json.loads(json.dumps(message)) if message is not None else None
+        chat.actions.put_nowait(BotAction(method, params, snapshot))
+        return message
+
+    def _bot_json(self) -> dict:
+        return {"id": self.bot_id, "is_bot": True, "first_name": "Card Bot", "username": "fake_card_bot"}
+
+    @staticmethod
+    def _user_json(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "language_code": "ru"}
+
+    @staticmethod
+    def _chat_json(chat_id: int) -> dict:
+        return {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"}
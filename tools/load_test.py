@@ -0,0 +1,385 @@
+"""
+Нагрузочный тест бота без Telegram.
+
+Назначение:
+- Запуск фейкового Bot API (tools.fake_telegram) и бота (main.py)
+  в отдельном процессе, направленного на него через TELEGRAM_API_URL
+- N виртуальных пользователей одновременно проходят весь сценарий StateImage:
+  /start -> листание фонов -> выбор фона -> готовый или свой текст ->
+  повод -> (листание текстов) -> первая открытка -> листание стилей -> выбор
+  (--delivery album: альбом всех стилей -> выбор открытки по номеру)
+- Задержка каждого шага: от отправки апдейта до ответа бота,
+  которого ждёт пользователь (новое сообщение или правка сообщения)
+- p50 / p99 задержки по шагам, пропускная способность, доля ошибок
+- Вызовы API по методам: количество, ошибки, объём загруженных файлов
+
+Модуль НЕ используется напрямую в Telegram-боте.
+Запускается отдельно из корня проекта:
+    python -m tools.load_test --users 20 --flows 3
+    python -m tools.load_test --mode webhook --api-latency 50 --upload-mbps 20 --out load.json
+    python -m tools.load_test --delivery album --upload-mbps 20
+    python -m tools.load_test --no-spawn --port 8081   # бот уже запущен с TELEGRAM_API_URL
+
+Бот пишет служебные данные (FSM, кэши file_id и открыток) в отдельную
+DATA_DIR (--data-dir, по умолчанию временная папка): фейковые file_id
+не попадают в рабочие кэши. Повторный прогон с той же --data-dir
+идёт с прогретым кэшем открыток.
+
+Ошибка шага — нет ответа за --timeout, alert вместо ответа или сообщение
+бота об ошибке. После ошибки пользователь начинает сценарий заново с /start.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import secrets
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from tools.fake_telegram import FakeTelegramApi
+
+logger = logging.getLogger(__name__)
+
+# ===== SETTINGS =====
+BASE_DIR = Path(__file__).resolve().parent.parent
+FAKE_TOKEN = "123456789:FAKE-load-test-token"
+# id виртуальных пользователей: не пересекаются с настоящими
+FIRST_USER_ID = 9_000_000_000
+OCCASIONS = ("coming", "new_year", "christmas", "old_new_year")
+OWN_TEXTS = (
+    "С праздником!",
+    "Счастья, здоровья и тепла в новом году",
+    "Пусть сбудется всё задуманное",
+    "Мира и добра вашему дому, радости и улыбок каждый день",
+)
+# начало сообщений бота, которые означают ошибку сценария
+ERROR_TEXTS = ("Ошибка", "Что-то пошло не так", "Сейчас очень много открыток", "Тексты недоступны")
+
+
+class StepFailed(Exception):
+    pass
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoadStats:
+    """
+    Задержки и ошибки по шагам сценария.
+    """
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, Counter] = {}
+        self.flows_done = 0
+        self.flows_failed = 0
+
+    def ok(self, step: str, latency: float) -> None:
+        self.latencies.setdefault(step, []).append(latency)
+        self.errors.setdefault(step, Counter())
+
+    def failed(self, step: str, reason: str) -> None:
+        self.latencies.setdefault(step, [])
+        self.errors.setdefault(step, Counter())[reason] += 1
+
+    def summary(self) -> dict:
+        steps = {}
+        for step, latencies in self.latencies.items():
+            errors = sum(self.errors[step].values())
+            total = len(latencies) + errors
+            steps[step] = {
+                "count": total,
+                "errors": errors,
+                "error_rate": errors / total if total else 0.0,
+                "reasons": dict(self.errors[step]),
+                "latency": {
+                    "p50": percentile(latencies, 0.5),
+                    "p99": percentile(latencies, 0.99),
+                    "mean": statistics.fmean(latencies),
+                } if latencies else None,
+            }
+        return steps
+
+
+class VirtualUser:
+    """
+    Пользователь, проходящий сценарий StateImage с паузами «на подумать».
+    """
+
+    def __init__(self, api: FakeTelegramApi, user_id: int, args, stats: LoadStats):
+        self.api = api
+        self.user_id = user_id
+        self.args = args
+        self.stats = stats
+        self.chat = api.chat(user_id)
+        self.rng = random.Random(args.seed * 1_000_003 + user_id)
+        # сообщение бота с кнопками, на котором пользователь нажимает следующую
+        self.message: dict | None = None
+
+    async def run(self) -> None:
+        for _ in range(self.args.flows):
+            try:
+                await self.flow()
+                self.stats.flows_done += 1
+            except StepFailed:
+                self.stats.flows_failed += 1
+                # ответы на неудавшийся шаг могут прийти позже — не путаем их со следующими
+                await asyncio.sleep(self.args.think)
+                self.chat.drain()
+
+    async def flow(self) -> None:
+        await self.step("start", self.say("/start"), "sendPhoto")
+        for _ in range(self.args.browse):
+            await self.step("browse_background", self.press("next"), "editMessageMedia")
+        await self.step("select_background", self.press("select"), "sendMessage")
+
+        own_text = self.rng.random() < self.args.own_text
+        await self.step("text_mode", self.press("user_text" if own_text else "bot_text"), "sendMessage")
+        occasion = self.rng.choice(OCCASIONS)
+        # альбом: ждём сам альбом и клавиатуру выбора после него
+        rendered = ("sendMediaGroup", "sendMessage") if self.args.delivery == "album" else ("editMessageMedia",)
+        if own_text:
+            await self.step("occasion", self.press(occasion), "sendMessage")
+            text = f"{self.rng.choice(OWN_TEXTS)} {self.user_id % 1000}"
+            await self.step("render_own_text", self.say(text), *rendered)
+        else:
+            await self.step("occasion", self.press(occasion), "editMessageText")
+            for _ in range(self.args.texts):
+                await self.step("browse_text", self.press("next_text"), "sendMessage")
+            await self.step("render_bot_text", self.press("select_text"), *rendered)
+
+        if self.args.delivery == "album":
+            buttons = [button for row in self.message["reply_markup"]["inline_keyboard"] for button in row]
+            choice = self.rng.choice(buttons)["callback_data"]
+            await self.step("select_card", self.press(choice), "sendPhoto")
+            return
+        for _ in range(self.args.styles):
+            await self.step("browse_style", self.press("next"), "editMessageMedia")
+        await self.step("select_card", self.press("select"), "sendPhoto")
+
+    def say(self, text: str):
+        return lambda: self.api.user_message(self.user_id, text)
+
+    def press(self, data: str):
+        return lambda: self.api.press(self.user_id, self.message, data)
+
+    async def step(self, name: str, send, *expect: str) -> None:
+        """
+        Отправляет апдейт и ждёт от бота действий expect (по порядку) в чате пользователя.
+        """
+        await asyncio.sleep(self.args.think * self.rng.uniform(0.5, 1.5))
+        started = time.perf_counter()
+        try:
+            await send()
+            for method in expect:
+                self.message = await self.wait_for(method, started + self.args.timeout)
+        except StepFailed as error:
+            self.stats.failed(name, str(error))
+            raise
+        except Exception as error:
+            self.stats.failed(name, f"{type(error).__name__}: {error}")
+            raise StepFailed(name) from error
+        self.stats.ok(name, time.perf_counter() - started)
+
+    async def wait_for(self, method: str, deadline: float) -> dict:
+        while True:
+            try:
+                action = await asyncio.wait_for(
+                    self.chat.actions.get(), max(0.0, deadline - time.perf_counter())
+                )
+            except asyncio.TimeoutError:
+                raise StepFailed(f"timeout: нет {method}") from None
+            if action.method == "answerCallbackQuery" and action.params.get("show_alert"):
+                raise StepFailed(f"alert: {action.params.get('text', '')[:40]}")
+            if action.method == "sendMessage" and action.params["text"].startswith(ERROR_TEXTS):
+                raise StepFailed(f"сообщение: {action.params['text'][:40]}")
+            if action.method == method:
+                return action.message
+
+
+async def spawn_bot(args, api_url: str, data_dir: Path, log_file) -> asyncio.subprocess.Process:
+    """
+    Запускает бота в отдельном процессе, направленным на фейковый API.
+    """
+    env = {
+        **os.environ,
+        "BOT": FAKE_TOKEN,
+        "TELEGRAM_API_URL": api_url,
+        "DATA_DIR": str(data_dir),
+        "BOT_MODE": args.mode,
+        "CARD_DELIVERY": args.delivery,
+        "METRICS_PORT": "0",
+    }
+    if args.mode == "webhook":
+        env.update({
+            "WEBHOOK_HOST": args.host,
+            "WEBHOOK_PORT": str(args.webhook_port),
+            "WEBHOOK_URL": f"http://{args.host}:{args.webhook_port}",
+            "WEBHOOK_SECRET": secrets.token_urlsafe(16),
+        })
+    return await asyncio.create_subprocess_exec(
+        sys.executable, str(BASE_DIR / "main.py"),
+        cwd=BASE_DIR, env=env, stdout=log_file, stderr=log_file,
+    )
+
+
+async def stop_bot(process: asyncio.subprocess.Process, timeout: float) -> None:
+    if process.returncode is not None:
+        return
+    process.send_signal(signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Бот не остановился за %s с, завершаем принудительно", timeout)
+        process.kill()
+        await process.wait()
+
+
+def print_report(result: dict) -> None:
+    print(f"{'step':<18} | {'count':>6} | {'errors':>6} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for step, summary in result["steps"].items():
+        latency = summary["latency"] or {"p50": float("nan"), "p99": float("nan")}
+        print(
+            f"{step:<18} | {summary['count']:>6} | {summary['errors']:>6} |"
+            f" {latency['p50'] * 1000:8.1f} | {latency['p99'] * 1000:8.1f}"
+        )
+        for reason, count in summary["reasons"].items():
+            print(f"{'':<18}   {count} x {reason}")
+
+    totals = result["totals"]
+    print(
+        f"Duration: {totals['duration']:.1f} s | flows: {totals['flows_done']} ok,"
+        f" {totals['flows_failed']} failed | {totals['flows_per_second']:.2f} flows/s"
+        f" | {totals['steps_per_second']:.1f} steps/s | error rate: {totals['error_rate']:.2%}"
+    )
+    print("API calls:")
+    for method, stats in result["api"].items():
+        print(
+            f"  {method:<24} calls={stats['calls']:<6} errors={stats['errors']:<4}"
+            f" uploads={stats['uploads']:<5} {stats['upload_bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+
+async def run(args) -> dict:
+    api = FakeTelegramApi(FAKE_TOKEN, latency=args.api_latency / 1000, upload_mbps=args.upload_mbps)
+    await api.start(args.host, args.port)
+    api_url = f"http://{args.host}:{args.port}"
+
+    process = None
+    log_file = None
+    temp_dir = None
+    try:
+        if not args.no_spawn:
+            data_dir = args.data_dir
+            if data_dir is None:
+                temp_dir = tempfile.TemporaryDirectory(prefix="card-bot-load-")
+                data_dir = Path(temp_dir.name)
+            log_file = open(args.bot_log, "wb")
+            process = await spawn_bot(args, api_url, data_dir, log_file)
+            print(f"Bot started (pid {process.pid}), log: {args.bot_log}")
+        else:
+            print(f"Waiting for a bot with TELEGRAM_API_URL={api_url} BOT={FAKE_TOKEN}")
+
+        await asyncio.wait_for(api.ready.wait(), args.startup_timeout)
+        print(f"Users: {args.users}, flows per user: {args.flows}, mode: {args.mode}, delivery: {args.delivery}")
+
+        stats = LoadStats()
+        users = [VirtualUser(api, FIRST_USER_ID + i, args, stats) for i in range(args.users)]
+
+        async def start_user(index: int, user: VirtualUser) -> None:
+            # пользователи приходят равномерно в течение ramp секунд
+            await asyncio.sleep(args.ramp * index / max(1, len(users)))
+            await user.run()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(start_user(i, user) for i, user in enumerate(users)))
+        duration = time.perf_counter() - started
+    finally:
+        if process is not None:
+            await stop_bot(process, args.startup_timeout)
+        if log_file is not None:
+            log_file.close()
+        await api.stop()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    steps = stats.summary()
+    total_steps = sum(step["count"] for step in steps.values())
+    total_errors = sum(step["errors"] for step in steps.values())
+    return {
+        "meta": {
+            "users": args.users,
+            "flows": args.flows,
+            "mode": args.mode,
+            "delivery": args.delivery,
+            "api_latency_ms": args.api_latency,
+            "upload_mbps": args.upload_mbps,
+            "think": args.think,
+            "seed": args.seed,
+        },
+        "totals": {
+            "duration": duration,
+            "flows_done": stats.flows_done,
+            "flows_failed": stats.flows_failed,
+            "flows_per_second": stats.flows_done / duration,
+            "steps_per_second": total_steps / duration,
+            "error_rate": total_errors / total_steps if total_steps else 0.0,
+        },
+        "steps": steps,
+        "api": {method: vars(method_stats) for method, method_stats in sorted(api.stats.items())},
+    }
+
+
+def main():
+    """
+    Точка входа нагрузочного теста.
+    """
+    parser = argparse.ArgumentParser(description="Load-test the bot against a local fake Bot API")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--flows", type=int, default=1, help="scenario runs per user")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--delivery", choices=("carousel", "album"), default="carousel", help="bot CARD_DELIVERY")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081, help="fake Bot API port")
+    parser.add_argument("--webhook-port", type=int, default=8082, help="bot webhook port (--mode webhook)")
+    parser.add_argument("--no-spawn", action="store_true", help="do not start the bot, wait for a running one")
+    parser.add_argument("--data-dir", type=Path, help="bot DATA_DIR, a temporary directory by default")
+    parser.add_argument("--bot-log", type=Path, default=BASE_DIR / "data" / "load_test_bot.log")
+    parser.add_argument("--browse", type=int, default=3, help="backgrounds browsed per flow")
+    parser.add_argument("--texts", type=int, default=1, help="ready texts browsed per flow")
+    parser.add_argument("--styles", type=int, default=3, help="card styles browsed per flow")
+    parser.add_argument("--own-text", type=float, default=0.3, help="share of flows with the user's own text")
+    parser.add_argument("--think", type=float, default=0.3, help="mean pause between steps, seconds")
+    parser.add_argument("--ramp", type=float, default=5.0, help="spread user arrivals over N seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-step timeout, seconds")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="fake API response delay, ms")
+    parser.add_argument("--upload-mbps", type=float, default=0.0, help="fake API upload bandwidth, 0 = unlimited")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, help="save results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    args.bot_log.parent.mkdir(parents=True, exist_ok=True)
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
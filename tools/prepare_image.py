@@ -6,18 +6,33 @@
 - Приведение изображений к допустимым размерам
 - Отсев слишком маленьких изображений
 - Оптимизация размера и формата
+- Два варианта каждого фона: полный (для генерации открыток)
+  и маленький browse (для листания фонов в боте)
 
 Модуль НЕ используется напрямую в Telegram-боте.
 Запускается отдельно — вручную или на сервере — при:
 - добавлении новых фоновых изображений
 - обновлении набора фонов
 
+    python -m tools.prepare_image [--workers N] [--force]
+
 Логика работы:
 1. Берёт изображения из assets/images
-2. Проверяет минимальный размер
-3. Уменьшает изображение, если оно превышает допустимые размеры
-4. Сохраняет результат в assets/previews
-5. Исходные изображения не изменяет
+2. Пропускает изображения, не изменившиеся с прошлого запуска
+   (манифест data/prepare_manifest.json: размер, mtime и sha256 исходника,
+   параметры обработки)
+3. Проверяет минимальный размер
+4. Уменьшает изображение, если оно превышает допустимые размеры
+   (JPEG декодируется сразу в уменьшенном виде через draft)
+5. Сохраняет результат в assets/previews, а уменьшенную до BROWSE_SIDE
+   и сильнее сжатую копию — в assets/browse.
+   Запись атомарная: запущенный бот никогда не видит недописанный файл
+6. Пересобирает каталог фонов assets/catalogue.json, который бот
+   загружает при старте: стабильный id, размеры, ориентация, объём,
+   sha256 и известные file_id Telegram каждого фона
+7. Исходные изображения не изменяет
+
+Изменённые изображения обрабатываются параллельно на нескольких процессах.
 
 Формат:
 - Вход: JPG / JPEG / PNG
@@ -26,21 +41,79 @@
 Модуль можно запускать как standalone-скрипт.
 """
 
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+
+from dotenv import dotenv_values
 from PIL import Image
 
 # ===== PATHS =====
 BASE_DIR = Path(__file__).resolve().parent.parent
 SRC_DIR = BASE_DIR / "assets" / "images"
 DST_DIR = BASE_DIR / "assets" / "previews"
-
-DST_DIR.mkdir(parents=True, exist_ok=True)
+BROWSE_DIR = BASE_DIR / "assets" / "browse"
+MANIFEST_PATH = BASE_DIR / "data" / "prepare_manifest.json"
+CATALOGUE_PATH = BASE_DIR / "assets" / "catalogue.json"
+# папка служебных данных бота: DATA_DIR из окружения или .env, как в config.Settings
+# (сам config не загружается — ему нужен токен BOT)
+DATA_DIR = Path(
+    os.environ.get("DATA_DIR")
+    or dotenv_values(BASE_DIR / ".env").get("DATA_DIR")
+    or BASE_DIR / "data"
+)
 
 # ===== SETTINGS =====
 MIN_SIDE = 320
 MAX_SIDE = 1280
+JPEG_QUALITY = 90
+# browse-вариант: только для листания фонов, качество важнее объёма
+BROWSE_SIDE = 480
+BROWSE_QUALITY = 70
 ALLOWED_EXT = (".jpg", ".jpeg", ".png")
 
+# параметры обработки: при их изменении все изображения готовятся заново
+PARAMS = {
+    "min_side": MIN_SIDE,
+    "max_side": MAX_SIDE,
+    "quality": JPEG_QUALITY,
+    "browse_side": BROWSE_SIDE,
+    "browse_quality": BROWSE_QUALITY,
+    "version": 3,
+}
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def background_id(name: str) -> str:
+    """
+    Стабильный id фона: зависит только от имени файла,
+    поэтому одинаков на всех машинах и после пересборки превью.
+    """
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()[:10]
+
+
+def atomic_save(img: Image.Image, out_path: Path, quality: int = JPEG_QUALITY, progressive: bool = False) -> None:
+    """
+    Сохраняет JPEG во временный файл рядом с целевым и заменяет его одной операцией.
+    """
+    tmp_path = out_path.with_name(f".{out_path.name}.tmp")
+    try:
+        img.save(tmp_path, format="JPEG", quality=quality, optimize=True, progressive=progressive)
+        os.replace(tmp_path, out_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
 
 def prepare_image(src_path: Path) -> Path | None:
     """
@@ -54,6 +127,7 @@ def prepare_image(src_path: Path) -> Path | None:
        - уменьшает изображение с сохранением пропорций
        - конвертирует в RGB
        - сохраняет в оптимизированном формате JPEG
+       - сохраняет browse-вариант в BROWSE_DIR под тем же именем
 
        Параметры:
        - src_path: путь к исходному изображению
@@ -63,27 +137,35 @@ def prepare_image(src_path: Path) -> Path | None:
        - None, если изображение не прошло проверку или произошла ошибка
        """
     try:
-        img = Image.open(src_path)
-        img = img.convert("RGB")
-        w, h = img.size
+        with Image.open(src_path) as img:
+            # размер известен из заголовка, пиксели ещё не декодированы
+            w, h = img.size
 
-        # ❌ слишком маленькое
-        if min(w, h) < MIN_SIDE:
-            print(f"SKIP (too small): {src_path.name}")
-            return None
+            # ❌ слишком маленькое
+            if min(w, h) < MIN_SIDE:
+                print(f"SKIP (too small): {src_path.name}")
+                return None
 
-        # 🔧 уменьшаем, если нужно
-        scale = min(MAX_SIDE / w, MAX_SIDE / h, 1)
-        new_w = int(w * scale)
-        new_h = int(h * scale)
+            # 🔧 уменьшаем, если нужно
+            scale = min(MAX_SIDE / w, MAX_SIDE / h, 1)
+            new_w = int(w * scale)
+            new_h = int(h * scale)
 
-        if scale < 1:
-            img = img.resize((new_w, new_h), Image.LANCZOS)
+            if scale < 1:
+                # JPEG: декодирование сразу в 1/2, 1/4 или 1/8 размера (не меньше целевого)
+                img.draft("RGB", (new_w, new_h))
+                result = img.convert("RGB").resize((new_w, new_h), Image.LANCZOS, reducing_gap=3.0)
+            else:
+                result = img.convert("RGB")
 
         out_path = DST_DIR / src_path.name
-        img.save(out_path, format="JPEG", quality=90, optimize=True)
+        atomic_save(result, out_path)
+
+        browse = result.copy()
+        browse.thumbnail((BROWSE_SIDE, BROWSE_SIDE), Image.LANCZOS, reducing_gap=2.0)
+        atomic_save(browse, BROWSE_DIR / src_path.name, BROWSE_QUALITY, progressive=True)
 
-        print(f"OK: {src_path.name} -> {new_w}x{new_h}")
+        print(f"OK: {src_path.name} -> {new_w}x{new_h}, browse {browse.width}x{browse.height}")
         return out_path
 
     except Exception as e:
@@ -91,31 +173,210 @@ def prepare_image(src_path: Path) -> Path | None:
         return None
 
 
+def _prepare_entry(src_path: Path, content_hash: str) -> tuple[str, dict]:
+    """
+    Готовит изображение и возвращает запись манифеста (в рабочем процессе).
+    """
+    stat = src_path.stat()
+    out_path = prepare_image(src_path)
+    return src_path.name, {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": content_hash,
+        "params": PARAMS,
+        "output": out_path.name if out_path else None,
+    }
+
+
+def load_manifest() -> dict[str, dict]:
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def atomic_write_json(path: Path, payload) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=1, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def save_manifest(manifest: dict[str, dict]) -> None:
+    atomic_write_json(MANIFEST_PATH, manifest)
+
+
+def load_bot_file_ids(data_dir: Path = DATA_DIR) -> dict[str, tuple[str, str]]:
+    """
+    Читает кэш file_id бота (DATA_DIR/file_ids.sqlite3) только для чтения.
+    Возвращает {путь относительно проекта: (sha256, file_id)}.
+
+    Файл читается напрямую, а не через services.file_id_cache:
+    тот загружает настройки бота (config), которым нужен токен BOT.
+    """
+    path = data_dir / "file_ids.sqlite3"
+    if not path.exists():
+        print(f"WARNING: no file_id cache at {path}")
+        return {}
+    db = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        return {
+            path: (content_hash, file_id)
+            for path, content_hash, file_id in db.execute(
+                "SELECT path, content_hash, file_id FROM file_ids"
+            )
+        }
+    except sqlite3.Error as e:
+        print(f"WARNING: file_id cache not read: {e}")
+        return {}
+    finally:
+        db.close()
+
+
+def build_catalogue(data_dir: Path = DATA_DIR) -> list[dict]:
+    """
+    Собирает каталог по готовым превью в assets/previews.
+
+    file_id берутся из прошлого каталога и из кэша file_id бота
+    (DATA_DIR/file_ids.sqlite3), если содержимое файла не изменилось.
+    file_id действительны только для бота, который их получил.
+    """
+    bot_file_ids = load_bot_file_ids(data_dir)
+
+    def bot_file_id(path: Path, content_hash: str) -> str | None:
+        entry = bot_file_ids.get(path.relative_to(BASE_DIR).as_posix())
+        return entry[1] if entry and entry[0] == content_hash else None
+
+    try:
+        previous = {e["file"]: e for e in json.loads(CATALOGUE_PATH.read_text(encoding="utf-8"))}
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    catalogue = []
+    for full in sorted(p for p in DST_DIR.iterdir() if p.suffix.lower() in ALLOWED_EXT):
+        browse = BROWSE_DIR / full.name
+        if not browse.exists():
+            browse = None
+        with Image.open(full) as img:
+            width, height = img.size
+
+        full_hash = file_hash(full)
+        browse_hash = file_hash(browse) if browse else None
+        old = previous.get(full.name, {})
+        old_ids = old.get("file_ids", {})
+        file_ids = {
+            "full": bot_file_id(full, full_hash)
+            or (old_ids.get("full") if old.get("sha256") == full_hash else None),
+            "browse": browse and (
+                bot_file_id(browse, browse_hash)
+                or (old_ids.get("browse") if old.get("browse_sha256") == browse_hash else None)
+            ),
+        }
+
+        catalogue.append({
+            "id": background_id(full.name),
+            "file": full.name,
+            "browse": browse.name if browse else None,
+            "width": width,
+            "height": height,
+            "orientation": "landscape" if width > height else "portrait" if height > width else "square",
+            "bytes": full.stat().st_size,
+            "sha256": full_hash,
+            "browse_sha256": browse_hash,
+            "file_ids": file_ids,
+        })
+    return catalogue
+
+
+def is_up_to_date(src_path: Path, entry: dict | None) -> tuple[bool, str | None]:
+    """
+    Проверяет запись манифеста.
+    Возвращает (не изменилось, sha256 — если пришлось посчитать).
+
+    Совпали размер и mtime — хэш не считается.
+    Изменился только mtime — решает sha256 содержимого.
+    """
+    if not entry or entry.get("params") != PARAMS:
+        return False, None
+    if entry["output"] and not (
+        (DST_DIR / entry["output"]).exists() and (BROWSE_DIR / entry["output"]).exists()
+    ):
+        return False, None
+
+    stat = src_path.stat()
+    if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        return True, None
+
+    content_hash = file_hash(src_path)
+    if entry["size"] == stat.st_size and entry["sha256"] == content_hash:
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return True, content_hash
+    return False, content_hash
+
+
 def main():
     """
        Точка входа для пакетной обработки изображений.
 
        Проходит по всем изображениям в директории assets/images
-       и подготавливает их для использования в боте.
+       и подготавливает новые и изменённые для использования в боте.
 
        Используется для:
        - первичной подготовки фонов
        - массового обновления изображений
        """
-    images = [
+    parser = argparse.ArgumentParser(description="Prepare background previews")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    parser.add_argument(
+        "--data-dir", type=Path, default=DATA_DIR,
+        help="bot DATA_DIR with file_ids.sqlite3 (default: DATA_DIR from env/.env or data/)",
+    )
+    args = parser.parse_args()
+
+    DST_DIR.mkdir(parents=True, exist_ok=True)
+    BROWSE_DIR.mkdir(parents=True, exist_ok=True)
+
+    images = sorted(
         p for p in SRC_DIR.iterdir()
         if p.suffix.lower() in ALLOWED_EXT
-    ]
-
+    )
     print(f"Found images: {len(images)}")
 
-    prepared = 0
+    manifest = {} if args.force else load_manifest()
+    jobs = []
     for img_path in images:
-        if prepare_image(img_path):
-            prepared += 1
+        up_to_date, content_hash = is_up_to_date(img_path, manifest.get(img_path.name))
+        if not up_to_date:
+            jobs.append((img_path, content_hash or file_hash(img_path)))
+
+    # исходник удалён — удаляем и подготовленное из него превью
+    names = {p.name for p in images}
+    for name in [name for name in manifest if name not in names]:
+        output = manifest.pop(name)["output"]
+        if output:
+            (DST_DIR / output).unlink(missing_ok=True)
+            (BROWSE_DIR / output).unlink(missing_ok=True)
+            print(f"REMOVED: {output}")
+
+    print(f"Unchanged: {len(images) - len(jobs)}, to prepare: {len(jobs)}")
 
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(_prepare_entry, *zip(*jobs)))
+    else:
+        results = [_prepare_entry(path, content_hash) for path, content_hash in jobs]
+
+    manifest.update(results)
+    save_manifest(manifest)
+
+    prepared = sum(1 for _, entry in results if entry["output"])
     print(f"Prepared images: {prepared}")
 
+    catalogue = build_catalogue(args.data_dir)
+    atomic_write_json(CATALOGUE_PATH, catalogue)
+    print(f"Catalogue: {len(catalogue)} backgrounds -> {CATALOGUE_PATH.relative_to(BASE_DIR)}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,182 @@
+"""
+Утилита предварительной генерации открыток с готовыми текстами.
+
+Назначение:
+- Заполнение кэша открыток (services/card_cache) заранее,
+  например перед праздничным пиком
+- После прогона выбор готового текста в боте (select_text)
+  отдаёт открытки из кэша без генерации
+
+Модуль НЕ используется напрямую в Telegram-боте.
+Запускается отдельно из корня проекта:
+    python -m tools.prerender_cards [--workers N]
+
+Логика работы:
+1. Перебирает все сочетания: фон из assets/previews,
+   повод из config.OCCASIONS, текст из texts/
+2. Пропускает сочетания, все стили которых уже есть в кэше
+   (повторный запуск продолжает с места остановки)
+3. Генерирует первое сочетание и по его объёму оценивает объём всего
+   каталога. Если каталог не помещается в кэш (CARD_CACHE_MAX_MB),
+   останавливается: открытки вытесняли бы друг друга, и повторный
+   запуск никогда не закончил бы работу. --allow-eviction — генерировать всё равно
+4. Генерирует все стили STYLES параллельно на нескольких процессах;
+   одновременно в работе не больше 2 × workers сочетаний,
+   готовые открытки сразу уходят в кэш и не копятся в памяти
+5. Сохраняет результат в тот же кэш, который читает бот
+
+Формат и качество открыток берутся из настроек бота (OUTPUT_*),
+иначе ключи кэша не совпадут.
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import replace
+from pathlib import Path
+
+from PIL import Image
+
+from config import OCCASIONS, image_files, settings
+from services.card_cache import card_cache
+from services.image_generator_v3 import STYLES, OutputFormat, RenderedCard
+from services.text_service import text_catalogue
+
+Job = tuple[Path, str, str]
+
+
+def render_all_styles(
+    background: Path, title: str, message: str, output: OutputFormat
+) -> list[RenderedCard]:
+    """
+    Генерирует открытку во всех стилях (в рабочем процессе).
+    """
+    from services.image_generator_v3 import pic_creator
+
+    return pic_creator(background, title, message, 0, replace(output, in_memory=True))
+
+
+def collect_jobs(output: OutputFormat) -> tuple[list[Job], int]:
+    """
+    Возвращает сочетания (фон, заголовок, текст), которых ещё нет в кэше,
+    и количество уже готовых сочетаний.
+    """
+    jobs = []
+    done = 0
+    for background in (image.full for image in image_files):
+        for occasion in OCCASIONS.values():
+            title = occasion["title"]
+            for message in text_catalogue.get(occasion["file"]):
+                keys = [
+                    card_cache.make_key(background, title, message, style_id, output)
+                    for style_id in STYLES
+                ]
+                if all(card_cache.contains(key) for key in keys):
+                    done += 1
+                else:
+                    jobs.append((background, title, message))
+    return jobs, done
+
+
+def background_pixels() -> dict[Path, int]:
+    """
+    Площадь каждого фона в пикселях (из каталога или из файла).
+    """
+    pixels = {}
+    for image in image_files:
+        if image.width and image.height:
+            pixels[image.full] = image.width * image.height
+        else:
+            with Image.open(image.full) as img:
+                pixels[image.full] = img.width * img.height
+    return pixels
+
+
+def store_cards(job: Job, cards: list[RenderedCard], output: OutputFormat) -> int:
+    """
+    Сохраняет открытки сочетания в кэш. Возвращает их объём в байтах.
+    """
+    background, title, message = job
+    for card in cards:
+        key = card_cache.make_key(background, title, message, card.style_id, output)
+        card_cache.put(key, card)
+    return sum(card.size for card in cards)
+
+
+def estimate_bytes(jobs: list[Job], sample: Job, sample_bytes: int) -> int:
+    """
+    Оценивает объём открыток для jobs по объёму одного готового сочетания:
+    размер открыток пропорционален площади фона.
+    """
+    pixels = background_pixels()
+    bytes_per_pixel = sample_bytes / pixels[sample[0]]
+    return int(sum(bytes_per_pixel * pixels[background] for background, _, _ in jobs))
+
+
+def main():
+    """
+    Точка входа для пакетной генерации открыток.
+    """
+    parser = argparse.ArgumentParser(description="Pre-render bot-text cards into the card cache")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--allow-eviction", action="store_true",
+        help="render even if the catalogue does not fit into CARD_CACHE_MAX_MB",
+    )
+    args = parser.parse_args()
+
+    # те же параметры, что у пула генерации бота (services/render_engine)
+    output = OutputFormat(
+        format=settings.OUTPUT_FORMAT,
+        quality=settings.OUTPUT_QUALITY,
+        compress_level=settings.OUTPUT_PNG_COMPRESS_LEVEL,
+        in_memory=settings.OUTPUT_IN_MEMORY,
+    )
+    jobs, done = collect_jobs(output)
+    print(f"Already cached: {done}, to render: {len(jobs)}")
+    if not jobs:
+        return
+
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # первое сочетание — образец для оценки объёма всего каталога
+        sample, *rest = jobs
+        sample_bytes = store_cards(sample, executor.submit(render_all_styles, *sample, output).result(), output)
+        rendered += 1
+        print(f"OK [{rendered}/{len(jobs)}]: {sample[0].name} | {sample[1]}")
+        expected = card_cache.total_bytes + estimate_bytes(rest, sample, sample_bytes)
+        print(f"Expected cache size: {expected // 2**20} MB of {card_cache.max_bytes // 2**20} MB")
+        if expected > card_cache.max_bytes and not args.allow_eviction:
+            print(
+                "ERROR: the catalogue does not fit into the card cache, cards would evict each other. "
+                "Raise CARD_CACHE_MAX_MB or pass --allow-eviction."
+            )
+            sys.exit(1)
+
+        # в работе не больше 2 × workers сочетаний: готовые открытки
+        # сразу уходят в кэш и не накапливаются в памяти
+        pending = iter(rest)
+        futures: dict[Future, Job] = {}
+        while True:
+            while len(futures) < 2 * args.workers and (job := next(pending, None)):
+                futures[executor.submit(render_all_styles, *job, output)] = job
+            if not futures:
+                break
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = futures.pop(future)
+                try:
+                    store_cards(job, future.result(), output)
+                except Exception as e:
+                    print(f"ERROR: {job[0].name} | {job[1]} -> {e}")
+                    continue
+                rendered += 1
+                print(f"OK [{rendered}/{len(jobs)}]: {job[0].name} | {job[1]}")
+
+    print(f"Rendered: {rendered}, cache: {card_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()